@@ -0,0 +1,85 @@
+"""
+Benchmark rendering format strings with the compiled formats against walking
+the Block tree, and reusing the memoized output when the values are
+unchanged.
+
+The formats are like those used by the bundled modules, the time per call to
+Formatter.format() is reported for each.
+
+    python benchmarks/bench_formatter.py [calls]
+"""
+
+import sys
+import time
+
+from py3status.composite import Composite
+from py3status.formatter import Formatter
+
+FORMATS = {
+    "text": "{interface}: {total}",
+    "numbers": r"[\?color=cpu_used_percent CPU {cpu_used_percent:.2f}%] "
+    r"[\?color=mem_used_percent Mem {mem_used:.2f}/{mem_total:.2f} GB]",
+    "conditions": r"[\?if=is_input 😮|♪]: {percentage}%",
+    "switches": "{state} [[[{artist} ]- {title}]|[{file}]]",
+    "lengths": r"[\?max_length=20 {title}] [\?min_length=5 {percentage}]",
+    "composite": r"{icon} [\?color=good {format_forecast}] {temperature}",
+}
+
+PARAMS = {
+    "interface": "wlp3s0",
+    "total": "12.3 KiB/s",
+    "cpu_used_percent": 12.5,
+    "mem_used": 3.21,
+    "mem_total": 15.6,
+    "is_input": False,
+    "percentage": 42,
+    "state": "[play]",
+    "artist": "Björk",
+    "title": "Army of Me",
+    "file": "army_of_me.flac",
+    "icon": "☀",
+    "temperature": "21°C",
+    "format_forecast": Composite(
+        [{"full_text": "☁ 18°C", "color": "#AAAAAA"}, {"full_text": " ☂ 15°C"}]
+    ),
+}
+
+
+class Module:
+    color_cpu_used_percent = "#00FF00"
+    color_mem_used_percent = "#FFFF00"
+
+    class py3:
+        COLOR_GOOD = "#00FF00"
+
+
+def run(formatter, format_string, calls, memo_key=None):
+    module = Module()
+    formatter.format(format_string, module, PARAMS, memo_key=memo_key)
+    start = time.perf_counter()
+    for _ in range(calls):
+        formatter.format(format_string, module, PARAMS, memo_key=memo_key)
+    return time.perf_counter() - start
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    tree = Formatter(compiled=False)
+    compiled = Formatter()
+    print(f"{calls} calls per format")
+    for name, format_string in FORMATS.items():
+        tree_time = run(tree, format_string, calls)
+        compiled_time = run(compiled, format_string, calls)
+        memo_time = run(compiled, format_string, calls, memo_key="bench")
+        print(
+            f"{name:>10}: tree {tree_time / calls * 1e6:.2f}us, "
+            f"compiled {compiled_time / calls * 1e6:.2f}us "
+            f"({tree_time / compiled_time:.2f}x), "
+            f"memoized {memo_time / calls * 1e6:.2f}us "
+            f"({tree_time / memo_time:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
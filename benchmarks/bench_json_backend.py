@@ -0,0 +1,64 @@
+"""
+Benchmark the json backends end to end.
+
+For each installed backend a line from i3status is parsed, a click event is
+parsed and the output of a number of modules is turned into a line for the
+bar, the lines per second are reported.
+
+    python benchmarks/bench_json_backend.py [modules] [lines]
+"""
+
+import json
+import sys
+import time
+
+from py3status import codec
+from py3status.output import OutputFormat
+
+CLICK = ',{"name": "clock", "instance": "first", "button": 1, "x": 1737, "y": 13}'
+
+
+def make_outputs(modules):
+    return [
+        [
+            {
+                "full_text": f"module {index} 12:{line:02d} ▂▄▆",
+                "instance": f"module {index}",
+                "name": "module",
+                "color": "#00FF00",
+                "separator": False,
+                "separator_block_width": 9,
+            }
+        ]
+        for line in range(10)
+        for index in range(modules)
+    ]
+
+
+def run(modules, lines):
+    output_format = OutputFormat.instance_for("i3bar")
+    outputs = make_outputs(modules)
+    i3status_line = "," + json.dumps([x[0] for x in outputs[:modules]])
+    start = time.perf_counter()
+    for line in range(lines):
+        codec.loads(i3status_line[1:])
+        codec.loads(CLICK[1:])
+        offset = (line % 10) * modules
+        out = [output_format.format(x) for x in outputs[offset : offset + modules]]
+        f",[{','.join(out)}]\n"
+    return time.perf_counter() - start
+
+
+def main():
+    modules = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    lines = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    print(f"{modules} modules, {lines} lines")
+    for name in codec.available():
+        codec.use(name)
+        elapsed = run(modules, lines)
+        print(f"{name:>7}: {elapsed:.3f}s ({lines / elapsed:.0f} lines per second)")
+
+
+if __name__ == "__main__":
+    main()
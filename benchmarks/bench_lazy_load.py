@@ -0,0 +1,84 @@
+"""
+Benchmark loading the configured modules at startup with and without
+lazy_load.
+
+Each run is done in a new python process so that the module imports are not
+already cached.  Lazy modules are not imported until they are first shown so
+the time saved is the cost of importing and setting up the modules.
+
+    python benchmarks/bench_lazy_load.py [runs] [module ...]
+"""
+
+import subprocess
+import sys
+import time
+from argparse import Namespace
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+MODULES = [
+    "battery_level",
+    "clock",
+    "imap",
+    "keyboard_layout",
+    "mail",
+    "net_rate",
+    "networkmanager",
+    "sysdata",
+    "volume_status",
+    "weather_owm",
+    "xkb_input",
+    "xrandr",
+]
+
+
+def child(lazy, modules):
+    from py3status.core import Py3statusWrapper
+    from py3status.parse_config import process_config
+
+    with TemporaryDirectory() as tmp_dir:
+        config_path = Path(tmp_dir) / "config"
+        lines = [f"py3status {{\n    lazy_load = {lazy}\n}}"]
+        lines += [f'order += "{module}"' for module in modules]
+        config_path.write_text("\n".join(lines))
+        wrapper = Py3statusWrapper(Namespace())
+        wrapper.config.update({"cache_timeout": 60, "include_paths": [], "minimum_interval": 0.1})
+        wrapper.config["py3_config"] = process_config(config_path)
+        wrapper.i3status_thread = None
+        wrapper.build_container_index()
+
+    start = time.perf_counter()
+    wrapper.load_modules(modules, {})
+    elapsed = time.perf_counter() - start
+    print(elapsed, len(wrapper.modules))
+
+
+def run(lazy, modules):
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", str(lazy), *modules],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+    return float(output[0]), int(output[1])
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2] == "True", sys.argv[3:])
+        return
+
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    modules = sys.argv[2:] or MODULES
+
+    print(f"{len(modules)} modules, best of {runs} runs")
+    for lazy in (False, True):
+        results = [run(lazy, modules) for _ in range(runs)]
+        best = min(elapsed for elapsed, _ in results)
+        loaded = results[0][1]
+        name = "lazy" if lazy else "eager"
+        print(f"{name:>6}: {best * 1000:.1f}ms ({loaded} modules)")
+
+
+if __name__ == "__main__":
+    main()
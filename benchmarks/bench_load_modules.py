@@ -0,0 +1,106 @@
+"""
+Benchmark starting up a bar of 50 modules, from loading them until every
+module's post_config_hook() has run, with one worker thread and with the
+default number.
+
+The modules are made up, a mix of ones that are quick to load, ones with an
+import that blocks (eg talking to dbus) and ones with a post_config_hook()
+that runs a command or makes a request, or that uses the CPU.
+
+    python benchmarks/bench_load_modules.py [modules] [delay]
+"""
+
+import sys
+import time
+from argparse import Namespace
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from py3status.core import ModuleRunner, Py3statusWrapper
+from py3status.parse_config import process_config
+from py3status.scheduler import WORKERS_DEFAULT
+
+MODULE = """
+import time
+
+{import_code}
+
+
+class Py3status:
+    def post_config_hook(self):
+        {hook_code}
+
+    def {name}(self):
+        return {{"full_text": "{name}"}}
+"""
+
+# the code for each kind of module, blocking calls sleep for delay seconds
+KINDS = {
+    "plain": ("", "pass"),
+    "slow_import": ("time.sleep({delay})", "pass"),
+    "blocking_hook": ("", "time.sleep({delay})"),
+    "cpu_hook": ("", "sum(range(200000))"),
+}
+
+
+def make_modules(path, count, delay):
+    names = []
+    kinds = list(KINDS)
+    for index in range(count):
+        kind = kinds[index % len(kinds)]
+        name = f"{kind}_{index}"
+        import_code, hook_code = KINDS[kind]
+        (path / f"{name}.py").write_text(
+            MODULE.format(
+                name=name,
+                import_code=import_code.format(delay=delay),
+                hook_code=hook_code.format(delay=delay),
+            )
+        )
+        names.append(name)
+    (path / "config").write_text("\n".join(f'order += "{name}"' for name in names))
+    return names
+
+
+def run(path, names, workers):
+    # a new name each run so the modules are imported again
+    for name in names:
+        sys.modules.pop(name, None)
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.config.update({"cache_timeout": 60, "include_paths": [path], "minimum_interval": 0.1})
+    wrapper.config["py3_config"] = process_config(path / "config")
+    wrapper.i3status_thread = None
+    wrapper.build_container_index()
+    wrapper.py3_modules = names
+    wrapper.workers.max_workers = workers
+
+    start = time.perf_counter()
+    wrapper.load_modules(names, wrapper.get_configured_discoverable_modules())
+    loaded = time.perf_counter() - start
+    for module in wrapper.modules.values():
+        wrapper.workers.submit(ModuleRunner(module), None)
+    while not all(module.enabled for module in wrapper.modules.values()):
+        time.sleep(0.001)
+    started = time.perf_counter() - start
+    wrapper.workers.stop()
+    return loaded, started, len(wrapper.modules)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+    with TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir)
+        names = make_modules(path, count, delay)
+        print(f"{count} modules, blocking calls take {delay}s")
+        for workers in [1, WORKERS_DEFAULT]:
+            loaded, started, modules = run(path, names, workers)
+            print(
+                f"{workers:>3} workers: loaded {loaded:.3f}s, started {started:.3f}s "
+                f"({modules} modules)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark turning the output of large composite modules into json.
+
+A module's output is formatted when it is updated, when other modules update
+it is unchanged and the cached json is used.  The time per call is reported
+for both.
+
+    python benchmarks/bench_process_module_output.py [items] [calls]
+"""
+
+import sys
+import time
+from argparse import Namespace
+
+from py3status.core import Py3statusWrapper
+from py3status.output import OutputFormat
+
+
+class Composite:
+    def __init__(self, items):
+        self.items = items
+        self.output = self.make_output()
+
+    def make_output(self):
+        return [
+            {
+                "full_text": f"item {index} {time.time()}",
+                "instance": f"composite {index}",
+                "name": "composite",
+                "separator": False,
+                "separator_block_width": 0,
+                "markup": "pango",
+                "index": index,
+            }
+            for index in range(self.items)
+        ]
+
+    def get_latest(self):
+        return self.output
+
+
+def run(wrapper, composite, calls, changed):
+    module = {"module": composite, "position": [0], "color": "#00FF00"}
+    elapsed = 0
+    for _ in range(calls):
+        if changed:
+            composite.output = composite.make_output()
+        start = time.perf_counter()
+        wrapper.process_module_output(module)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.config["py3_config"] = {"general": {}}
+    wrapper.output_format = OutputFormat.instance_for("i3bar")
+    composite = Composite(items)
+
+    results = [
+        ("changed", run(wrapper, composite, calls, changed=True)),
+        ("cached", run(wrapper, composite, calls, changed=False)),
+    ]
+    print(f"{items} items, {calls} calls")
+    for name, elapsed in results:
+        print(f"{name:>8}: {elapsed:.3f}s ({elapsed / calls * 1e6:.1f}us per call)")
+
+
+if __name__ == "__main__":
+    main()
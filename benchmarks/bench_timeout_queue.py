@@ -0,0 +1,74 @@
+"""
+Benchmark the core timeout queue against the previous list based one.
+
+A number of modules are scheduled and then repeatedly rescheduled, the way
+they are on a busy bar, and the time per reschedule is reported.
+
+    python benchmarks/bench_timeout_queue.py [modules] [reschedules]
+"""
+
+import random
+import sys
+import time
+from argparse import Namespace
+
+from py3status.core import Py3statusWrapper
+
+
+class ListTimeoutQueue:
+    """
+    The previous timeout queue, a dict of sets keyed by time and a sorted
+    list of the keys.
+    """
+
+    def __init__(self):
+        self.timeout_keys = []
+        self.timeout_queue = {}
+        self.timeout_queue_lookup = {}
+
+    def add(self, module, cache_time):
+        key = self.timeout_queue_lookup.get(module, None)
+        if key:
+            queue_item = self.timeout_queue[key]
+            queue_item.remove(module)
+            if not queue_item:
+                del self.timeout_queue[key]
+                self.timeout_keys.remove(key)
+        if cache_time not in self.timeout_keys:
+            self.timeout_queue[cache_time] = {module}
+            self.timeout_keys.append(cache_time)
+            self.timeout_keys.sort()
+        else:
+            self.timeout_queue[cache_time].add(module)
+        self.timeout_queue_lookup[module] = cache_time
+
+
+def run(add, modules, reschedules):
+    rand = random.Random(0)
+    names = [f"module_{i}" for i in range(modules)]
+    for name in names:
+        add(name, rand.random() * 60)
+    start = time.perf_counter()
+    for _ in range(reschedules):
+        add(rand.choice(names), rand.random() * 60)
+    return time.perf_counter() - start
+
+
+def main():
+    modules = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    reschedules = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    legacy = ListTimeoutQueue()
+    wrapper = Py3statusWrapper(Namespace())
+
+    results = [
+        ("list", run(legacy.add, modules, reschedules)),
+        ("heap", run(wrapper.timeout_process_add_queue, modules, reschedules)),
+    ]
+    print(f"{modules} modules, {reschedules} reschedules")
+    for name, elapsed in results:
+        print(f"{name:>6}: {elapsed:.3f}s ({elapsed / reschedules * 1e6:.1f}us per reschedule)")
+
+
+if __name__ == "__main__":
+    main()
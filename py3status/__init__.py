@@ -10,11 +10,17 @@ except ImportError:
 
 
 def main():
-    from py3status.argparsers import parse_cli_args
+    from py3status.profiling import StartupProfile
 
-    options = parse_cli_args()
+    startup_profile = StartupProfile()
 
-    from py3status.core import Py3statusWrapper
+    with startup_profile.stage("argparse"):
+        from py3status.argparsers import parse_cli_args
+
+        options = parse_cli_args()
+
+    with startup_profile.stage("import py3status"):
+        from py3status.core import Py3statusWrapper
 
     try:
         locale.setlocale(locale.LC_ALL, "")
@@ -24,7 +30,7 @@ def main():
 
     py3 = None
     try:
-        py3 = Py3statusWrapper(options)
+        py3 = Py3statusWrapper(options, startup_profile)
         py3.setup()
     except (BrokenPipeError, KeyboardInterrupt) as err:
         if py3:
@@ -139,6 +139,20 @@ def parse_cli_args():
         metavar="PATH",
         type=Path,
     )
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        dest="startup_profile",
+        help="print how long each stage of starting up takes to stderr",
+    )
+    parser.add_argument(
+        "--startup-profile-json",
+        action="store",
+        dest="startup_profile_json",
+        help="also write the startup profile to FILE as json",
+        metavar="FILE",
+        type=Path,
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -0,0 +1,86 @@
+"""
+Encode and decode json using the fastest library available.
+
+json is parsed for every line from i3status and every click and written for
+every update to the bar so orjson or ujson are used when installed, falling
+back to the json module from the standard library.  Callers use
+codec.dumps() and codec.loads() so that the backend in use is picked up.
+"""
+
+import json
+
+# the backends in order of preference
+BACKENDS = ["orjson", "ujson", "json"]
+
+backend = "json"
+dumps = json.dumps
+loads = json.loads
+
+
+def _orjson():
+    import orjson
+
+    encode = orjson.dumps
+    fallback = json.dumps
+
+    def orjson_dumps(obj):
+        try:
+            return encode(obj).decode("utf-8")
+        except TypeError:
+            # eg dicts with keys that are not strings
+            return fallback(obj)
+
+    return orjson_dumps, orjson.loads
+
+
+def _ujson():
+    import ujson
+
+    encode = ujson.dumps
+
+    def ujson_dumps(obj):
+        return encode(obj, escape_forward_slashes=False)
+
+    return ujson_dumps, ujson.loads
+
+
+def _json():
+    return json.dumps, json.loads
+
+
+LOADERS = {"orjson": _orjson, "ujson": _ujson, "json": _json}
+
+
+def available():
+    """
+    Return the names of the backends that are installed.
+    """
+    names = []
+    for name in BACKENDS:
+        try:
+            LOADERS[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def use(name="auto"):
+    """
+    Use the named backend or the best installed one if name is auto.
+    Raises ValueError if the backend is unknown or not installed.
+    """
+    global backend, dumps, loads
+
+    if name == "auto":
+        name = available()[0]
+    if name not in LOADERS:
+        raise ValueError(
+            f"Invalid json backend `{name}`, should be one of `auto`, `{'`, `'.join(BACKENDS)}`."
+        )
+    try:
+        dumps, loads = LOADERS[name]()
+    except ImportError:
+        raise ValueError(f"json backend `{name}` is not installed.")
+    backend = name
+    return name
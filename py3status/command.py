@@ -6,6 +6,9 @@ import socket
 import threading
 from pathlib import Path
 
+from py3status import codec
+from py3status.scheduler import LANE_INTERACTIVE
+
 logger = logging.getLogger(__name__)
 
 SERVER_ADDRESS = "/tmp/py3status_uds"
@@ -89,8 +92,21 @@ examples:
         # refresh all modules
         py3-cmd refresh --all
 """
+STATS_EPILOG = """
+examples:
+    stats:
+        # show statistics for all instances of the wifi module
+        py3-cmd stats wifi
+
+        # show statistics for a module with instance name
+        py3-cmd stats "weather_yahoo chicago"
+
+        # show statistics for all modules
+        py3-cmd stats
+"""
 EPILOGS = {
     "refresh": REFRESH_EPILOG,
+    "stats": STATS_EPILOG,
     "list": LIST_EPILOG,
     "docstring": DOCSTRING_EPILOG,
     "click": CLICK_EPILOG,
@@ -104,6 +120,7 @@ SUBPARSERS = [
     ("docstring", "docstring utility", "*"),
     ("list", "list modules", "*"),
     ("refresh", "refresh modules", "*"),
+    ("stats", "show module statistics", "*"),
     # ('exec', 'execute methods', '+'),
 ]
 CLICK_OPTIONS = [
@@ -173,7 +190,7 @@ class CommandRunner:
             module = self.py3_wrapper.output_modules[module_name]
             logger.debug("refreshing module '%s'", module_name)
             if module["type"] == "py3status":
-                module["module"].force_update()
+                module["module"].force_update(LANE_INTERACTIVE)
             else:
                 update_i3status = True
         if update_i3status:
@@ -201,18 +218,32 @@ class CommandRunner:
             # trigger the event
             self.py3_wrapper.events_thread.dispatch_event(event)
 
+    def stats(self, data):
+        """
+        return the statistics of the module(s) or of all modules
+        """
+        modules = data.get("module")
+        if modules:
+            module_names = self.find_modules(modules)
+        else:
+            module_names = list(self.py3_wrapper.output_modules)
+        return self.py3_wrapper.get_stats(module_names)
+
     def run_command(self, data):
         """
         check the given command and send to the correct dispatcher
+        any response to be sent back is returned
         """
         command = data.get("command")
         logger.debug("running command '%s'", command)
         if command == "refresh":
             self.refresh(data)
         elif command == "refresh_all":
-            self.py3_wrapper.refresh_modules()
+            self.py3_wrapper.refresh_modules(lane=LANE_INTERACTIVE)
         elif command == "click":
             self.click(data)
+        elif command == "stats":
+            return self.stats(data)
 
 
 class CommandServer(threading.Thread):
@@ -269,9 +300,11 @@ class CommandServer(threading.Thread):
                 try:
                     data = connection.recv(MAX_SIZE)
                     if data:
-                        data = json.loads(data.decode("utf-8"))
+                        data = codec.loads(data.decode("utf-8"))
                         logger.debug("received payload %s", data)
-                        self.command_runner.run_command(data)
+                        response = self.command_runner.run_command(data)
+                        if response is not None:
+                            connection.sendall(codec.dumps(response).encode("utf-8"))
                 finally:
                     # Clean up the connection
                     connection.close()
@@ -306,7 +339,7 @@ def command_parser():
         parser.add_argument(f"-{short}", f"--{name}", action="store_true", help=msg)
 
     # make subparsers // ALIAS_DEPRECATION: remove metavar later
-    metavar = "{click,list,refresh}"
+    metavar = "{click,list,refresh,stats}"
     subparsers = parser.add_subparsers(dest="command", metavar=metavar)
     sps = {}
 
@@ -536,6 +569,17 @@ def send_command():
             # Send data
             verbose("sending")
             sock.sendall(msg)
+            if options.command == "stats":
+                # let the server know we are done and wait for the response
+                sock.shutdown(socket.SHUT_WR)
+                response = b""
+                while True:
+                    data = sock.recv(MAX_SIZE)
+                    if not data:
+                        break
+                    response += data
+                if response:
+                    print(json.dumps(json.loads(response.decode("utf-8")), indent=2))
         finally:
             verbose("closing socket")
             sock.close()
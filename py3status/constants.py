@@ -326,3 +326,30 @@ RETIRED_MODULES = {
 MARKUP_LANGUAGES = ["pango", "none"]
 
 ON_ERROR_VALUES = ["hide", "show"]
+
+# failing modules have their retries backed off exponentially up to this many
+# seconds, with some random jitter
+BACKOFF_MAX = 600
+
+BACKOFF_JITTER = 0.2
+
+# seconds a module run may take before it is considered hung and its output
+# is shown as stale
+RUN_DEADLINE = 120
+
+STALE_COLOR = "#808080"
+
+# how often the watchdog checks for hung modules
+WATCHDOG_INTERVAL = 5
+
+# how often the snapshot of the modules' output is saved if it has changed
+SNAPSHOT_INTERVAL = 60
+
+# seconds after which a module's output in the snapshot is too old to show
+SNAPSHOT_MAX_AGE = 86400
+
+# the number of parsed format strings kept in the format cache
+FORMAT_CACHE_SIZE = 1000
+
+# ways a module can be run
+EXECUTION_VALUES = ["thread", "process"]
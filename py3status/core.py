@@ -5,23 +5,44 @@ import logging.handlers
 import sys
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from signal import SIGCONT, SIGTERM, SIGTSTP, SIGUSR1, Signals, signal
 from subprocess import Popen
-from threading import Event, Thread
+from threading import Event, Lock
 from traceback import extract_tb, format_stack, format_tb
 
+from py3status import codec
 from py3status.command import CommandServer
-from py3status.constants import LOGGING_CONFIG, LOGGING_LOG_FILE_CONFIG
+from py3status.constants import (
+    FORMAT_CACHE_SIZE,
+    LOGGING_CONFIG,
+    LOGGING_LOG_FILE_CONFIG,
+    SNAPSHOT_INTERVAL,
+    SNAPSHOT_MAX_AGE,
+    WATCHDOG_INTERVAL,
+)
 from py3status.events import Events
-from py3status.formatter import expand_color
+from py3status.formatter import Formatter, expand_color
 from py3status.helpers import print_stderr
 from py3status.i3status import I3status
 from py3status.log import module_logger_name, resolve_log_level
 from py3status.module import Module
 from py3status.output import OutputFormat
 from py3status.parse_config import process_config
-from py3status.profiling import profile
+from py3status.profiling import StartupProfile, format_startup_profile, profile
+from py3status.py3 import Py3
+from py3status.scheduler import (
+    LANE_BACKGROUND,
+    LANE_INTERACTIVE,
+    LANE_URGENT,
+    LANES,
+    WORKERS_DEFAULT,
+    AsyncLoop,
+    TimeoutQueue,
+    WorkerPool,
+)
+from py3status.stats import Histogram
 from py3status.udev_monitor import UdevMonitor
 
 DBUS_LEVELS = {"error": "critical", "warning": "normal", "info": "low"}
@@ -37,32 +58,20 @@ CONFIG_SPECIAL_SECTIONS = [
     "py3status",
 ]
 
-ENTRY_POINT_NAME = "py3status"
-ENTRY_POINT_KEY = "entry_point"
-logger = logging.getLogger(__name__)
+# how long after a click, updates to the clicked module skip frame pacing
+CLICK_RESPONSE_TIME = 1
 
+# clicks not followed by an update of the module within this many seconds are
+# not counted in the click to render latency
+CLICK_LATENCY_MAX = 60
 
-class Runner(Thread):
-    """
-    A Simple helper to run a module in a Thread so it is non-locking.
-    """
+# how long after starting to wait for modules to start before making the
+# startup profile report without them
+STARTUP_PROFILE_WAIT = 30
 
-    def __init__(self, module, py3_wrapper, module_name):
-        Thread.__init__(self)
-        self.daemon = True
-        self.module = module
-        self.module_name = module_name
-        self.py3_wrapper = py3_wrapper
-        self.start()
-
-    def run(self):
-        try:
-            self.module.run()
-        except:  # noqa e722
-            self.py3_wrapper.report_exception("Runner")
-        # the module is no longer running so notify the timeout logic
-        if self.module_name:
-            self.py3_wrapper.timeout_finished.append(self.module_name)
+ENTRY_POINT_NAME = "py3status"
+ENTRY_POINT_KEY = "entry_point"
+logger = logging.getLogger(__name__)
 
 
 class NoneSetting:
@@ -113,6 +122,38 @@ class CheckI3StatusThread(Task):
             self.timeout_queue_add(self, int(time.monotonic()) + 5)
 
 
+class Watchdog(Task):
+    """
+    Checks for modules that have been running for longer than their deadline.
+    This is run in the core thread so that it still works if all the workers
+    are stuck.
+    """
+
+    run_in_core = True
+    # the check can wait for the core to wake up for something else
+    timer_slack = WATCHDOG_INTERVAL
+
+    def __init__(self, py3_wrapper):
+        self.py3_wrapper = py3_wrapper
+
+    def run(self):
+        self.py3_wrapper.check_deadlines()
+        self.py3_wrapper.timeout_queue_add(self, time.monotonic() + WATCHDOG_INTERVAL)
+
+
+class SnapshotSaver(Task):
+    """
+    Saves the snapshot of the modules' output every so often.
+    """
+
+    def __init__(self, py3_wrapper):
+        self.py3_wrapper = py3_wrapper
+
+    def run(self):
+        self.py3_wrapper.save_snapshot(only_changed=True)
+        self.py3_wrapper.timeout_queue_add(self, time.monotonic() + SNAPSHOT_INTERVAL)
+
+
 class ModuleRunner(Task):
     """
     Starts up a Module
@@ -245,15 +286,26 @@ class Py3statusWrapper:
     This is the py3status wrapper.
     """
 
-    def __init__(self, options):
+    def __init__(self, options, startup_profile=None):
         """
         Useful variables we'll need.
         """
         self.config = vars(options)
+        self.click_latency = Histogram()
+        self.click_pending = {}
+        self.click_render_ts = {}
+        self.coalesce_window = 0
+        self.container_ancestors = {}
+        self.container_parents = {}
+        self.containers = set()
+        self.i3bar_resumed = Event()
+        self.i3bar_resumed.set()
         self.i3bar_running = True
         self.inhibit_signal_ts = time.monotonic()
         self.last_refresh_ts = time.monotonic()
+        self.last_write_ts = 0
         self.lock = Event()
+        self.max_refresh_rate = 0
         self.modules = {}
         self.next_allowed_signal = SIGTSTP
         self.notified_messages = set()
@@ -262,9 +314,21 @@ class Py3statusWrapper:
         self.py3_modules = []
         self.loaded_entry_points = None
         self.running = True
+        self.snapshot = {}
+        self.snapshot_stale = False
+        self.startup_profile = startup_profile or StartupProfile()
         self.stop_signal = SIGTSTP
+        # the storage shared with the modules
+        self.storage = Py3._storage
+        self.update_bypass = Event()
+        self.use_snapshot = False
+        self.update_pending_ts = {}
         self.update_queue = deque()
+        self.update_queue_ts = 0
         self.update_request = Event()
+        self.visibility_lock = Lock()
+        self.wakeups = deque()
+        self.writes_suppressed = 0
 
         # shared code
         self.common = Common(self)
@@ -272,90 +336,82 @@ class Py3statusWrapper:
         self.report_exception = self.common.report_exception
 
         # these are used to schedule module updates
+        self.async_loop = AsyncLoop(self)
         self.timeout_add_queue = deque()
         self.timeout_due = None
         self.timeout_finished = deque()
-        self.timeout_keys = []
         self.timeout_missed = {}
-        self.timeout_queue = {}
-        self.timeout_queue_lookup = {}
-        self.timeout_queue_lookup_previous = {}
+        self.timeout_queue = TimeoutQueue()
         self.timeout_running = set()
-        self.timeout_update_due = deque()
+        # modules due to run now, one queue for each priority lane
+        self.timeout_update_due = [deque() for _ in range(LANES)]
+        self.workers = WorkerPool(self)
 
-    def timeout_queue_add(self, item, cache_time=0):
+    def timeout_queue_add(self, item, cache_time=0, lane=None):
         """
         Add a item to be run at a future time.
         This must be a Module, I3statusModule or a Task
+
+        lane is the priority lane the item is run in when it is due now.  By
+        default this is the item's lane attribute or else background.
         """
+        if lane is None:
+            lane = getattr(item, "lane", LANE_BACKGROUND)
         # add the info to the add queue.  We do this so that actually adding
         # the module is done in the core thread.
-        self.timeout_add_queue.append((item, cache_time))
+        self.timeout_add_queue.append((item, cache_time, lane))
         # if the timeout_add_queue is not due to be processed until after this
         # update request is due then trigger an update now.
         if self.timeout_due is None or cache_time < self.timeout_due:
             self.update_request.set()
 
     def clear_timeout_due(self, module):
-        old = self.timeout_queue_lookup_previous.get(module, None)
-        if old:
-            if old == self.timeout_due:
-                self._set_new_timeout_due()
-            elif old in self.timeout_keys:
-                self.timeout_keys.remove(old)
-                self._set_new_timeout_due()
-
-    def _set_new_timeout_due(self):
-        # sort keys so earliest is first
-        self.timeout_keys.sort()
-
-        # when is next timeout due?
-        try:
-            self.timeout_due = self.timeout_keys[0]
-        except IndexError:
-            self.timeout_due = None
+        """
+        Remove any scheduled update for the module.
+        """
+        # like adding, removing is done in the core thread.
+        self.timeout_add_queue.append((module, None, None))
 
-    def timeout_process_add_queue(self, module, cache_time):
+    def timeout_process_add_queue(self, module, cache_time, lane=LANE_BACKGROUND):
         """
         Add a module to the timeout_queue if it is scheduled in the future or
         if it is due for an update immediately just trigger that.
 
-        the timeout_queue is a dict with the scheduled time as the key and the
-        value is a list of module instance names due to be updated at that
-        point. An ordered list of keys is kept to allow easy checking of when
-        updates are due.  A list is also kept of which modules are in the
-        update_queue to save having to search for modules in it unless needed.
+        the timeout_queue is a TimeoutQueue (a heap) of the modules and the
+        time they are scheduled to be updated.  A cache_time of None removes
+        the module from the timeout_queue.
         """
-        # If already set to update do nothing
-        if module in self.timeout_update_due:
+        if cache_time is None:
+            self.timeout_queue.remove(module)
+            self.timeout_due = self.timeout_queue.next_due()
             return
 
-        # remove if already in the queue
-        key = self.timeout_queue_lookup.get(module, None)
-        if key:
-            queue_item = self.timeout_queue[key]
-            queue_item.remove(module)
-            if not queue_item:
-                del self.timeout_queue[key]
-                self.timeout_keys.remove(key)
+        # If already set to update do nothing, unless it is now wanted in a
+        # higher priority lane
+        for due_lane, due in enumerate(self.timeout_update_due):
+            if module in due:
+                if due_lane <= lane or cache_time != 0:
+                    return
+                due.remove(module)
+                break
 
         if cache_time == 0:
             # if cache_time is 0 we can just trigger the module update
-            self.timeout_update_due.append(module)
-            if module in self.timeout_queue_lookup.keys():
-                del self.timeout_queue_lookup[module]
+            self.timeout_queue.remove(module)
+            self.timeout_update_due[lane].append(module)
         else:
-            # add the module to the timeout queue
-            if cache_time not in self.timeout_keys:
-                self.timeout_queue[cache_time] = {module}
-                self.timeout_keys.append(cache_time)
-
-                self._set_new_timeout_due()
-            else:
-                self.timeout_queue[cache_time].add(module)
-            # note that the module is in the timeout_queue
-            self.timeout_queue_lookup[module] = cache_time
-            self.timeout_queue_lookup_previous[module] = cache_time
+            # timer slack, rather than waking up just for this module run it
+            # with any others that are due a little after it.
+            slack = getattr(module, "timer_slack", None)
+            if slack:
+                self.timeout_queue.remove(module)
+                wakeup = self.timeout_queue.find_wakeup(cache_time, cache_time + slack)
+                if wakeup is not None:
+                    cache_time = wakeup
+            # add the module to the timeout queue, this replaces any time it
+            # was already scheduled for.
+            self.timeout_queue.add(module, cache_time)
+        self.timeout_due = self.timeout_queue.next_due()
 
     def timeout_queue_process(self):
         """
@@ -364,33 +420,13 @@ class Py3statusWrapper:
         # process any items that need adding to the queue
         while self.timeout_add_queue:
             self.timeout_process_add_queue(*self.timeout_add_queue.popleft())
-        now = time.monotonic()
-        due_timeouts = []
-        # find any due timeouts
-        for timeout in self.timeout_keys:
-            if timeout > now:
-                break
-            due_timeouts.append(timeout)
-
-        if due_timeouts:
-            # process them
-            for timeout in due_timeouts:
-                modules = self.timeout_queue[timeout]
-                # remove from the queue
-                del self.timeout_queue[timeout]
-                self.timeout_keys.remove(timeout)
-
-                for module in modules:
-                    # module no longer in queue
-                    del self.timeout_queue_lookup[module]
-                    # tell module to update
-                    self.timeout_update_due.append(module)
-
-            # when is next timeout due?
-            try:
-                self.timeout_due = self.timeout_keys[0]
-            except IndexError:
-                self.timeout_due = None
+
+        # find any due timeouts and tell the modules to update
+        self.timeout_update_due[LANE_BACKGROUND].extend(
+            self.timeout_queue.pop_due(time.monotonic())
+        )
+        # when is next timeout due?
+        self.timeout_due = self.timeout_queue.next_due()
 
         # process any finished modules.
         # Now that the module has finished running it may have been marked to
@@ -404,21 +440,33 @@ class Py3statusWrapper:
         while self.timeout_finished:
             module_name = self.timeout_finished.popleft()
             self.timeout_running.discard(module_name)
-            if module_name in self.timeout_missed:
-                module = self.timeout_missed.pop(module_name)
-                self.timeout_update_due.append(module)
-
-        # run any modules that are due
-        while self.timeout_update_due:
-            module = self.timeout_update_due.popleft()
-            module_name = getattr(module, "module_full_name", None)
-            # if the module is running then we do not want to trigger it but
-            # instead wait till it has finished running and then trigger
-            if module_name and module_name in self.timeout_running:
-                self.timeout_missed[module_name] = module
-            else:
-                self.timeout_running.add(module_name)
-                Runner(module, self, module_name)
+            module = self.modules.get(module_name)
+            if module and module.stale:
+                # a hung run has finally returned
+                module.clear_stale()
+            for module, lane in self.timeout_missed.pop(module_name, {}).items():
+                self.timeout_update_due[lane].append(module)
+
+        # run any modules that are due, highest priority lane first
+        for lane, due in enumerate(self.timeout_update_due):
+            while due:
+                module = due.popleft()
+                module_name = getattr(module, "module_full_name", None)
+                # if the module is running then we do not want to trigger it
+                # but instead wait till it has finished running and then
+                # trigger
+                if module_name and module_name in self.timeout_running:
+                    missed = self.timeout_missed.setdefault(module_name, {})
+                    if lane < missed.get(module, LANES):
+                        missed[module] = lane
+                elif getattr(module, "run_in_core", False):
+                    module.run()
+                elif getattr(module, "is_async", False):
+                    self.timeout_running.add(module_name)
+                    self.async_loop.submit(module, module_name)
+                else:
+                    self.timeout_running.add(module_name)
+                    self.workers.submit(module, module_name, lane)
 
         # we return how long till we next need to process the timeout_queue
         # this value should not be negative to avoid cpu overwhelming loops
@@ -469,24 +517,25 @@ class Py3statusWrapper:
             return self.loaded_entry_points
 
         loaded_entry_points = []
-        eps = importlib.metadata.entry_points(group=ENTRY_POINT_NAME)
-
-        for entry_point in eps:
-            try:
-                module = entry_point.load()
-            except Exception as err:
-                logger.error(
-                    "entry-point module '%s' (%s) %s",
-                    entry_point.name,
-                    entry_point.value,
-                    err,
-                )
-                continue
-            klass = getattr(module, Module.EXPECTED_CLASS, None)
-            if klass:
-                loaded_entry_points.append(
-                    (entry_point.name.split(".")[-1], entry_point.value, klass)
-                )
+        with self.startup_profile.stage("entry point discovery"):
+            eps = importlib.metadata.entry_points(group=ENTRY_POINT_NAME)
+
+            for entry_point in eps:
+                try:
+                    module = entry_point.load()
+                except Exception as err:
+                    logger.error(
+                        "entry-point module '%s' (%s) %s",
+                        entry_point.name,
+                        entry_point.value,
+                        err,
+                    )
+                    continue
+                klass = getattr(module, Module.EXPECTED_CLASS, None)
+                if klass:
+                    loaded_entry_points.append(
+                        (entry_point.name.split(".")[-1], entry_point.value, klass)
+                    )
         self.loaded_entry_points = loaded_entry_points
         return self.loaded_entry_points
 
@@ -520,6 +569,23 @@ class Py3statusWrapper:
                     discoverable_modules[module_name] = (source, item)
         return discoverable_modules
 
+    def create_module(self, module, discoverable_modules):
+        """
+        Create the Module for the named module, this is run in a thread of
+        load_modules().
+        """
+        start_time = time.perf_counter()
+        instance = None
+        payload = discoverable_modules.get(module.split(" ")[0])
+        if payload:
+            kind, Klass = payload
+            if kind == ENTRY_POINT_KEY:
+                instance = Klass()
+        my_m = Module(module, discoverable_modules, self, instance=instance)
+        if not my_m.lazy:
+            self.startup_profile.add_module(module, "import", time.perf_counter() - start_time)
+        return my_m
+
     def load_modules(self, modules_list, discoverable_modules):
         """
         Load the given modules from the list (contains instance name) with
@@ -530,21 +596,29 @@ class Py3statusWrapper:
             'weather_yahoo': ('/etc/py3status.d/', 'weather_yahoo.py'),
             'pewpew': ('entry_point', <Py3Status class>),  # entry-point module
         }
+
+        Modules are loaded at the same time by up to workers threads as
+        importing them can be slow.  They are added and any errors reported
+        in the order they are listed.
         """
-        for module in modules_list:
-            # ignore already provided modules (prevents double inclusion)
-            if module in self.modules:
-                continue
+        # ignore already provided modules (prevents double inclusion)
+        modules_list = [
+            module for module in dict.fromkeys(modules_list) if module not in self.modules
+        ]
+        if not modules_list:
+            return
+        max_workers = min(self.workers.max_workers, len(modules_list))
+        with ThreadPoolExecutor(max_workers, thread_name_prefix="py3status-load") as executor:
+            futures = [
+                executor.submit(self.create_module, module, discoverable_modules)
+                for module in modules_list
+            ]
+        for module, future in zip(modules_list, futures):
             try:
-                instance = None
-                payload = discoverable_modules.get(module.split(" ")[0])
-                if payload:
-                    kind, Klass = payload
-                    if kind == ENTRY_POINT_KEY:
-                        instance = Klass()
-                my_m = Module(module, discoverable_modules, self, instance=instance)
-                # only handle modules with available methods
-                if my_m.methods:
+                my_m = future.result()
+                # only handle modules with available methods, lazy loaded
+                # modules are checked once they are loaded
+                if my_m.methods or my_m.lazy:
                     self.modules[module] = my_m
                 else:
                     logger.debug("ignoring module '%s' (no methods found)", module)
@@ -639,8 +713,10 @@ class Py3statusWrapper:
         """
         # process py3status config
         config_path = self.config["i3status_config_path"]
-        py3_config = process_config(config_path, self)
+        with self.startup_profile.stage("config parsing"):
+            py3_config = process_config(config_path, self)
         self.config["py3_config"] = py3_config
+        self.build_container_index()
 
         # setup logging
         self._setup_logging()
@@ -677,6 +753,16 @@ class Py3statusWrapper:
                 k: v.strip() for k, v in (x.split(":", 1) for x in resources)
             }
 
+        # the json library used for i3status output, clicks and the bar
+        json_backend = self.config["py3_config"].get("py3status", {}).get("json_backend", "auto")
+        try:
+            json_backend = codec.use(json_backend)
+        except ValueError as e:
+            error = f"py3status.json_backend: {e}"
+            logger.error(error)
+            raise Exception(error)
+        logger.info("json backend: %s", json_backend)
+
         # setup i3status thread
         self.i3status_thread = I3status(self)
 
@@ -691,16 +777,14 @@ class Py3statusWrapper:
                 logger.info("adding i3status module '%s'", module)
             i3s_mode = "started"
             self.i3status_thread.start()
-            while not self.i3status_thread.ready:
-                if not self.i3status_thread.is_alive():
-                    # i3status is having a bad day, so tell the user what went
-                    # wrong and do the best we can with just py3status modules.
-                    err = self.i3status_thread.error
-                    self.notify_user(err)
-                    self.i3status_thread.mock()
-                    i3s_mode = "mocked"
-                    break
-                time.sleep(0.1)
+            self.i3status_thread.startup_done.wait()
+            if not self.i3status_thread.ready:
+                # i3status is having a bad day, so tell the user what went
+                # wrong and do the best we can with just py3status modules.
+                err = self.i3status_thread.error
+                self.notify_user(err)
+                self.i3status_thread.mock()
+                i3s_mode = "mocked"
 
         logger.debug("i3status thread %s with config %s", i3s_mode, py3_config)
 
@@ -748,6 +832,35 @@ class Py3statusWrapper:
                 logger.error(error)
                 raise Exception(error)
 
+        # the number of threads that run modules and tasks
+        self.workers.max_workers = self.get_py3status_setting(
+            "workers", WORKERS_DEFAULT, minimum=1, number_type=int
+        )
+
+        # frame pacing, limit how often we write to the bar and gather
+        # updates arriving close together into a single write
+        self.max_refresh_rate = self.get_py3status_setting("max_refresh_rate", 0)
+        self.coalesce_window = self.get_py3status_setting("coalesce_window", 0)
+
+        # the number of parsed format strings kept for all modules
+        Formatter.cache.set_size(
+            self.get_py3status_setting(
+                "format_cache_size", FORMAT_CACHE_SIZE, minimum=1, number_type=int
+            )
+        )
+
+        # show the output the modules had the last time py3status ran until
+        # they have updated
+        py3status_config = self.config["py3_config"].get("py3status", {})
+        for name in ["snapshot", "snapshot_stale"]:
+            value = py3status_config.get(name, False)
+            if not isinstance(value, bool):
+                error = f"py3status.{name} '{value}' is invalid and should be True or False"
+                logger.error(error)
+                raise Exception(error)
+        self.use_snapshot = py3status_config.get("snapshot", False)
+        self.snapshot_stale = py3status_config.get("snapshot_stale", False)
+
         # SIGTSTP can be received and indicates that all output should
         # stop and we should consider py3status suspended.  It is however
         # important that any processes using i3 ipc should continue to receive
@@ -769,7 +882,18 @@ class Py3statusWrapper:
         discoverable_modules = self.get_configured_discoverable_modules()
         if self.py3_modules:
             # load and spawn i3status.conf configured modules threads
+            start_time = time.perf_counter()
             self.load_modules(self.py3_modules, discoverable_modules)
+            logger.info(
+                "loaded %s modules in %.3fs, %s to be loaded lazily",
+                len(self.modules),
+                time.perf_counter() - start_time,
+                sum(module.lazy for module in self.modules.values()),
+            )
+            # lazy loaded modules may not start for a long time
+            self.startup_profile.pending = {
+                name for name, module in self.modules.items() if not module.lazy
+            }
 
         # determine the target output format
         self.output_format = OutputFormat.instance_for(
@@ -785,6 +909,21 @@ class Py3statusWrapper:
             color_separator,
         )
 
+    def get_py3status_setting(self, name, default, minimum=0, number_type=(int, float)):
+        """
+        Get a numeric setting from the py3status section of the config and
+        check that it is valid.
+        """
+        value = self.config["py3_config"].get("py3status", {}).get(name, default)
+        if isinstance(value, bool) or not isinstance(value, number_type) or value < minimum:
+            error = (
+                f"py3status.{name} '{value}' is invalid "
+                f"and should be a number of at least {minimum}"
+            )
+            logger.error(error)
+            raise Exception(error)
+        return value
+
     def notify_user(
         self,
         msg,
@@ -868,11 +1007,25 @@ class Py3statusWrapper:
         Set the Event lock, this will break all threads' loops.
         """
         self.running = False
+        # stop the workers
+        self.workers.stop()
+        self.async_loop.stop()
         # stop the command server
         try:
             self.commands_thread.kill()
         except:  # noqa e722
             pass
+        # wake the i3status thread so it can exit
+        try:
+            self.i3status_thread.stop()
+        except:  # noqa e722
+            pass
+
+        if self.use_snapshot:
+            try:
+                self.save_snapshot()
+            except Exception:
+                self.report_exception("snapshot could not be saved", notify_user=False)
 
         try:
             self.lock.set()
@@ -883,12 +1036,13 @@ class Py3statusWrapper:
         except:  # noqa e722
             pass
 
-    def refresh_modules(self, module_string=None, exact=True):
+    def refresh_modules(self, module_string=None, exact=True, lane=LANE_URGENT):
         """
         Update modules.
         if module_string is None all modules are refreshed
         if module_string then modules with the exact name or those starting
         with the given string depending on exact parameter will be refreshed.
+        lane is the priority lane the modules are run in.
         If a module is an i3status one then we refresh i3status.
         To prevent abuse, we rate limit this function to 100ms for full
         refreshes.
@@ -908,7 +1062,7 @@ class Py3statusWrapper:
             ):
                 if module["type"] == "py3status":
                     logger.debug("refreshing py3status module '%s'", name)
-                    module["module"].force_update()
+                    module["module"].force_update(lane)
                 else:
                     logger.debug("refreshing i3status module '%s'", name)
                     update_i3status = True
@@ -950,14 +1104,29 @@ class Py3statusWrapper:
         """
         if not isinstance(update, list):
             update = [update]
+        now = time.monotonic()
+        if not self.update_queue:
+            self.update_queue_ts = now
+        for item in update:
+            self.update_pending_ts.setdefault(item, now)
         self.update_queue.extend(update)
+        # urgent updates and responses to clicks are not held back by frame
+        # pacing
+        click_response = self.is_click_response(update)
+        if urgent or click_response:
+            self.update_bypass.set()
+        lane = LANE_INTERACTIVE if click_response else LANE_URGENT
 
         # find containers that use the modules that updated
-        containers = self.config["py3_config"][".module_groups"]
         containers_to_update = set()
+        container_updated = False
         for item in update:
-            if item in containers:
-                containers_to_update.update(set(containers[item]))
+            containers_to_update.update(self.container_parents.get(item, ()))
+            if item in self.containers:
+                container_updated = True
+        if container_updated:
+            # a container has updated, what it shows may have changed
+            self.update_visibility()
         # force containers to update
         for container in containers_to_update:
             container_module = self.output_modules.get(container)
@@ -966,21 +1135,291 @@ class Py3statusWrapper:
                 # if this update is urgent.
                 if urgent and container_module.get("urgent_function"):
                     container_module["urgent_function"](update)
-                # If a container has registered a content_function we use that
-                # to see if the container needs to be updated.
+                # If a container has registered its content we use that to see
+                # if the container needs to be updated.
                 # We only need to update containers if their active content has
-                # changed.
-                if container_module.get("content_function"):
-                    if set(update) & container_module["content_function"]():
-                        container_module["module"].force_update()
-                else:
-                    # we don't know so just update.
-                    container_module["module"].force_update()
+                # changed.  If we don't know we just update.
+                content = self.get_container_content(container_module)
+                if content is None or not content.isdisjoint(update):
+                    container_module["module"].force_update(lane)
 
         # we need to update the output
         if self.update_queue:
             self.update_request.set()
 
+    def build_container_index(self):
+        """
+        Index the containers eg group, frame that each module is in, directly
+        and at any depth nearest first, so that they do not need to be worked
+        out from the config on every update or click.
+        """
+        module_groups = self.config["py3_config"][".module_groups"]
+        self.container_parents = {name: tuple(parents) for name, parents in module_groups.items()}
+        ancestors = {}
+        for name, parents in module_groups.items():
+            found = []
+            todo = list(parents)
+            while todo:
+                container = todo.pop(0)
+                if container not in found:
+                    found.append(container)
+                    todo.extend(module_groups.get(container, []))
+            ancestors[name] = tuple(found)
+        self.container_ancestors = ancestors
+        self.containers = {name for parents in module_groups.values() for name in parents}
+
+    def get_container_content(self, container_module):
+        """
+        Return the set of modules a container is showing or None if the
+        container has not told us.  Containers either register a set that
+        they keep up to date or a content_function() that returns a new one.
+        """
+        content = container_module.get("content")
+        if content is None and container_module.get("content_function"):
+            content = container_module["content_function"]()
+        return content
+
+    def update_visibility(self):
+        """
+        Find which modules can not be seen because they are in a container
+        that is not showing them eg the inactive modules of a group, and let
+        the modules know.
+        """
+        py3_config = self.config["py3_config"]
+        with self.visibility_lock:
+            visible = set()
+            todo = list(py3_config["order"])
+            while todo:
+                name = todo.pop()
+                if name in visible:
+                    continue
+                visible.add(name)
+                items = py3_config.get(name, {}).get("items")
+                if not items:
+                    continue
+                shown = self.get_container_content(self.output_modules.get(name, {}))
+                if shown is not None:
+                    items = [item for item in items if item in shown]
+                todo.extend(items)
+            for name, module in self.modules.items():
+                hidden = name not in visible
+                if module.hidden != hidden:
+                    module.set_hidden(hidden)
+
+    def register_click(self, module_name):
+        """
+        A click event has been received for the module.  Note this so that
+        the module and its containers can be updated without delay.
+        """
+        click_ts = time.monotonic()
+        self.click_pending[module_name] = click_ts
+        self.click_render_ts[module_name] = click_ts
+        for container in self.container_ancestors.get(module_name, ()):
+            self.click_pending[container] = click_ts
+            self.click_render_ts[container] = click_ts
+
+    def is_click_response(self, update):
+        """
+        Check if any of the updated modules have been recently clicked.
+        """
+        if not self.click_pending:
+            return False
+        now = time.monotonic()
+        for module_name in update:
+            click_ts = self.click_pending.get(module_name)
+            if click_ts is None:
+                continue
+            if now - click_ts < CLICK_RESPONSE_TIME:
+                return True
+            self.click_pending.pop(module_name, None)
+        return False
+
+    def check_deadlines(self):
+        """
+        Find any modules that have been running for longer than their
+        deadline, mark their output as stale and log what they are doing.
+        """
+        now = time.monotonic()
+        frames = None
+        active = list(self.workers.active.items()) + list(self.async_loop.active.items())
+        for module_name, (ident, start) in active:
+            module = self.modules.get(module_name)
+            if not module or module.stale or not module.run_deadline:
+                continue
+            if now - start < module.run_deadline:
+                continue
+            module.mark_stale()
+            if frames is None:
+                frames = sys._current_frames()
+            stack = "".join(format_stack(frames[ident])) if ident in frames else ""
+            module._logger.warning(
+                "running for %.0fs, past its deadline of %ss\n%s",
+                now - start,
+                module.run_deadline,
+                stack,
+            )
+
+    def count_wakeup(self):
+        """
+        Keep track of how often the main loop wakes up.
+        """
+        now = time.monotonic()
+        if self.wakeups and int(now // 60) != int(self.wakeups[-1] // 60):
+            logger.debug("wakeups per minute: %s", self.wakeups_per_minute())
+        self.wakeups.append(now)
+
+    def wakeups_per_minute(self):
+        """
+        Return the number of times the main loop woke up in the last minute.
+        """
+        minute_ago = time.monotonic() - 60
+        while self.wakeups and self.wakeups[0] < minute_ago:
+            self.wakeups.popleft()
+        return len(self.wakeups)
+
+    def record_write_stats(self, updated):
+        """
+        Record, for the modules just written to the bar, how long it was
+        since they updated and since they were clicked.
+        """
+        clicks = set()
+        for module_name in updated:
+            update_ts = self.update_pending_ts.pop(module_name, None)
+            click_ts = self.click_render_ts.pop(module_name, None)
+            if click_ts is not None and self.last_write_ts - click_ts > CLICK_LATENCY_MAX:
+                click_ts = None
+            module = self.output_modules[module_name]
+            if module["type"] != "py3status":
+                continue
+            stats = module["module"].stats
+            if update_ts is not None:
+                stats.record("update_to_write", self.last_write_ts - update_ts)
+            if click_ts is not None:
+                stats.record("click_to_render", self.last_write_ts - click_ts)
+                clicks.add(click_ts)
+        # a module and its containers are updated by the same click
+        for click_ts in clicks:
+            self.click_latency.add(self.last_write_ts - click_ts)
+
+    def startup_profile_report(self):
+        """
+        Once the bar has been written to and the modules have started output
+        the startup profile if it was asked for.
+        """
+        profile = self.startup_profile
+        profile.milestone("first write to the bar")
+        if profile.pending and profile.now() < STARTUP_PROFILE_WAIT:
+            return
+        profile.reported = True
+        if not (self.config.get("startup_profile") or self.config.get("startup_profile_json")):
+            return
+        report = profile.report()
+        # stderr is redirected to /dev/null when not debugging
+        print(format_startup_profile(report), file=sys.__stderr__, flush=True)
+        if self.config.get("startup_profile_json"):
+            self.config["startup_profile_json"].write_text(codec.dumps(report))
+
+    def get_snapshot_key(self):
+        """
+        The snapshot is stored for each config file as different bars can
+        have different modules.
+        """
+        return str(self.config["i3status_config_path"])
+
+    def load_snapshot(self):
+        """
+        Show the output the modules had when the snapshot was saved, until
+        they update.
+        """
+        if not self.storage.initialized:
+            self.storage.init(self)
+        snapshot = self.storage.storage_get("_snapshot", self.get_snapshot_key()) or {}
+        now = time.time()
+        shown = []
+        for name, saved in snapshot.items():
+            module = self.modules.get(name)
+            if not module or now - saved["time"] > SNAPSHOT_MAX_AGE:
+                continue
+            output = saved["output"]
+            if self.snapshot_stale:
+                output = module.stale_output(output)
+            module.last_output = output
+            self.snapshot[name] = saved
+            shown.append(name)
+        logger.debug("snapshot shown for %s", shown)
+        if shown:
+            # not notify_update() as the containers have not started so can
+            # not tell us which modules they show
+            self.update_queue.extend(shown)
+            self.update_request.set()
+
+    def save_snapshot(self, only_changed=False):
+        """
+        Save the output of the modules to storage.  Modules that have not
+        updated with good output since the snapshot was loaded keep what was
+        saved for them before.
+        """
+        now = time.time()
+        snapshot = dict(self.snapshot)
+        changed = False
+        for name, module in self.modules.items():
+            if not module.has_current_output():
+                continue
+            output = module.last_output
+            if name not in snapshot or snapshot[name]["output"] != output:
+                changed = True
+            snapshot[name] = {"output": output, "time": now}
+        if only_changed and not changed:
+            return
+        self.snapshot = snapshot
+        self.storage.storage_set("_snapshot", self.get_snapshot_key(), snapshot)
+
+    def get_stats(self, module_names):
+        """
+        Return the statistics of the core and of the named modules.
+        """
+        stats = {
+            "core": {
+                "click_to_render": self.click_latency.as_dict(),
+                "format_cache": Formatter.cache.as_dict(),
+                "wakeups_per_minute": self.wakeups_per_minute(),
+                "workers": len(self.workers.threads),
+                "writes_suppressed": self.writes_suppressed,
+            },
+            "modules": {},
+        }
+        for module_name in sorted(module_names):
+            module = self.output_modules[module_name]
+            if module["type"] == "py3status":
+                stats["modules"][module_name] = module["module"].stats.as_dict()
+        return stats
+
+    def frame_delay(self):
+        """
+        Return how long to wait before writing the pending updates to the bar
+        when frame pacing is being used.
+        """
+        if not (self.max_refresh_rate or self.coalesce_window):
+            return 0
+        if self.update_bypass.is_set():
+            return 0
+        write_due = self.update_queue_ts + self.coalesce_window
+        if self.max_refresh_rate:
+            write_due = max(write_due, self.last_write_ts + 1 / self.max_refresh_rate)
+        return write_due - time.monotonic()
+
+    def loop_timeout(self, update_due):
+        """
+        Return how long the main loop can wait for an update request.  Updates
+        held back by frame pacing are written once their delay is over, the
+        timeout_queue is processed as usual meanwhile.
+        """
+        if self.update_queue:
+            delay = max(0, self.frame_delay())
+            if update_due is None or delay < update_due:
+                return delay
+        return update_due
+
     def create_output_modules(self):
         """
         Setup our output modules to allow easy updating of py3modules and
@@ -1035,8 +1474,14 @@ class Py3statusWrapper:
         """
         Process the output for a module and return a json string representing it.
         Color processing occurs here.
+
+        A py3status module's output is only replaced, never changed in place,
+        so if it is the same list as last time the json is reused.
         """
         outputs = module["module"].get_latest()
+        cached = module.get("json")
+        if cached and cached[0] is outputs:
+            return cached[1]
         if self.config["py3_config"]["general"].get("colors") is False:
             for output in outputs:
                 output.pop("color", None)
@@ -1048,12 +1493,38 @@ class Py3statusWrapper:
                     if "color" not in output:
                         output["color"] = color
         # format output and return
-        return self.output_format.format(outputs)
+        out = self.output_format.format(outputs)
+        module["json"] = (outputs, out)
+        return out
+
+    def process_update_queue(self, output):
+        """
+        Update the output, the json of each item in the bar, for the modules
+        in the update_queue.  Returns the names of the modules and if the
+        output has changed.
+        """
+        updated = []
+        changed = False
+        while len(self.update_queue):
+            module_name = self.update_queue.popleft()
+            module = self.output_modules[module_name]
+            out = self.process_module_output(module)
+            updated.append(module_name)
+
+            for index in module["position"]:
+                # store the output as json
+                if output[index] != out:
+                    output[index] = out
+                    changed = True
+        return updated, changed
 
     def i3bar_stop(self, signum, frame):
         if self.next_allowed_signal == signum and time.monotonic() > self.inhibit_signal_ts:
             logger.info("received stop_signal %s", Signals(signum).name)
             self.i3bar_running = False
+            self.i3bar_resumed.clear()
+            # wake the main loop so that it stops until we resume
+            self.update_request.set()
             # i3status should be stopped
             self.i3status_thread.suspend_i3status()
             self.sleep_modules()
@@ -1066,6 +1537,7 @@ class Py3statusWrapper:
         if self.next_allowed_signal == signum and time.monotonic() > self.inhibit_signal_ts:
             logger.info("received resume signal %s", Signals(signum).name)
             self.i3bar_running = True
+            self.i3bar_resumed.set()
             self.wake_modules()
             self.next_allowed_signal = self.stop_signal
         else:
@@ -1106,11 +1578,20 @@ class Py3statusWrapper:
         # content_function.
         self.create_output_modules()
 
+        # show the output from the last run while the modules start
+        if self.use_snapshot:
+            self.load_snapshot()
+            self.timeout_queue_add(SnapshotSaver(self), time.monotonic() + SNAPSHOT_INTERVAL)
+
         # start up all our modules
         for module in self.modules.values():
             task = ModuleRunner(module)
             self.timeout_queue_add(task)
 
+        # watch for modules that hang
+        if self.modules:
+            self.timeout_queue_add(Watchdog(self), time.monotonic() + WATCHDOG_INTERVAL)
+
         # this will be our output set to the correct length for the number of
         # items in the bar
         output = [None] * len(py3_config["order"])
@@ -1126,27 +1607,40 @@ class Py3statusWrapper:
         update_due = None
         # main loop
         while True:
+            # while i3bar is stopped nothing is run or written so sleep until
+            # it resumes
+            self.i3bar_resumed.wait()
+
             # process the timeout_queue and get interval till next update due
             update_due = self.timeout_queue_process()
 
             # wait until an update is requested
-            if self.update_request.wait(timeout=update_due):
+            if self.update_request.wait(timeout=self.loop_timeout(update_due)):
                 # event was set so clear it
                 self.update_request.clear()
+            self.count_wakeup()
 
-            while not self.i3bar_running:
-                time.sleep(0.1)
-
-            # check if an update is needed
-            if self.update_queue:
-                while len(self.update_queue):
-                    module_name = self.update_queue.popleft()
-                    module = self.output_modules[module_name]
-                    out = self.process_module_output(module)
-
-                    for index in module["position"]:
-                        # store the output as json
-                        output[index] = out
+            if not self.i3bar_running:
+                continue
 
-                # build output string and dump to stdout
-                self.output_format.write_line(output)
+            # check if an update is needed, with frame pacing we may want to
+            # wait for more updates while still running what is due
+            if self.update_queue and self.frame_delay() <= 0:
+                self.update_bypass.clear()
+
+                updated, changed = self.process_update_queue(output)
+                if changed:
+                    # build output string and dump to stdout
+                    self.output_format.write_line(output)
+                    self.last_write_ts = time.monotonic()
+                    self.record_write_stats(updated)
+                else:
+                    # the line is the same as the last one so do not make
+                    # the bar redraw it
+                    self.writes_suppressed += 1
+                    for module_name in updated:
+                        self.update_pending_ts.pop(module_name, None)
+                # this also reports modules that are slow to start so must
+                # not wait for a line to be written
+                if not self.startup_profile.reported:
+                    self.startup_profile_report()
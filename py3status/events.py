@@ -1,12 +1,13 @@
 import logging
 import select
 import sys
-from json import loads
 from shlex import quote as shell_quote
 from subprocess import PIPE, Popen
 from threading import Thread
 
+from py3status import codec
 from py3status.profiling import profile
+from py3status.scheduler import LANE_INTERACTIVE
 
 logger = logging.getLogger(__name__)
 
@@ -51,8 +52,14 @@ class IOPoller:
 class EventTask:
     """
     A simple task that can be run by the scheduler.
+
+    It has the module's name so that it never runs at the same time as the
+    module.  If the module is running it waits for it and then goes ahead of
+    any updates of the module as it is in the interactive lane.
     """
 
+    lane = LANE_INTERACTIVE
+
     def __init__(self, module_name, event, default_event, events_thread):
         self.events_thread = events_thread
         self.module_full_name = module_name
@@ -66,8 +73,13 @@ class EventTask:
 class EventClickTask:
     """
     A task to run an external on_click event
+
+    It does not call into the module so it is not named after it and does
+    not wait for the module to finish running.
     """
 
+    lane = LANE_INTERACTIVE
+
     def __init__(self, module_name, event, events_thread, command):
         self.events_thread = events_thread
         self.module_name = module_name
@@ -132,9 +144,9 @@ class Events(Thread):
         if command is None:
             return
         elif command == "refresh_all":
-            self.py3_wrapper.refresh_modules()
+            self.py3_wrapper.refresh_modules(lane=LANE_INTERACTIVE)
         elif command == "refresh":
-            self.py3_wrapper.refresh_modules(module_name)
+            self.py3_wrapper.refresh_modules(module_name, lane=LANE_INTERACTIVE)
         else:
             # In commands we are able to use substitutions for the text output
             # of a module
@@ -147,7 +159,7 @@ class Events(Thread):
             self.wm_msg(module_name, command)
             # to make the bar more responsive to users we ask for a refresh
             # of the module or of i3status if the module is an i3status one
-            self.py3_wrapper.refresh_modules(module_name)
+            self.py3_wrapper.refresh_modules(module_name, lane=LANE_INTERACTIVE)
 
     def wm_msg(self, module_name, command):
         """
@@ -182,13 +194,13 @@ class Events(Thread):
             # to make the bar more responsive to users we refresh the module
             # unless the on_click event called py3.prevent_refresh()
             if not module.prevent_refresh:
-                self.py3_wrapper.refresh_modules(module_name)
+                self.py3_wrapper.refresh_modules(module_name, lane=LANE_INTERACTIVE)
                 default_event = False
 
         if default_event:
             # default button 2 action is to clear this method's cache
             logger.debug("dispatching default event %s", event)
-            self.py3_wrapper.refresh_modules(module_name)
+            self.py3_wrapper.refresh_modules(module_name, lane=LANE_INTERACTIVE)
 
         # find container that holds the module and call its onclick
         module_groups = self.py3_config[".module_groups"]
@@ -224,6 +236,9 @@ class Events(Thread):
         # guess the module config name
         module_name = f"{name} {instance}".strip()
 
+        # let the core know so that the response is shown quickly
+        self.py3_wrapper.register_click(module_name)
+
         default_event = False
         module_info = self.output_modules.get(module_name)
         module = module_info["module"]
@@ -266,7 +281,7 @@ class Events(Thread):
                     # remove leading comma if present
                     if event_str[0] == ",":
                         event_str = event_str[1:]
-                    event = loads(event_str)
+                    event = codec.loads(event_str)
                     self.dispatch_event(event)
                 except Exception:
                     self.py3_wrapper.report_exception("event failed")
@@ -1,11 +1,13 @@
 import re
+from collections import OrderedDict
 from html import escape
 from math import ceil
 from numbers import Number
+from threading import Lock
 from urllib.parse import parse_qsl
 
 from py3status.composite import Composite
-from py3status.constants import COLOR_NAMES, COLOR_NAMES_EXCLUDED
+from py3status.constants import COLOR_NAMES, COLOR_NAMES_EXCLUDED, FORMAT_CACHE_SIZE
 
 
 def expand_color(color, default=None, passthrough=False, block=None):
@@ -30,9 +32,118 @@ def expand_color(color, default=None, passthrough=False, block=None):
     return COLOR_NAMES.get(color, color if passthrough else default)
 
 
+class ParsedFormat:
+    """
+    A tokenized format string and what has been worked out from it, the rest
+    is filled in by the Formatter when it is first needed.
+    """
+
+    __slots__ = [
+        "block",
+        "color_names",
+        "compiled",
+        "contains",
+        "memo",
+        "module_colors",
+        "placeholders",
+        "tokens",
+    ]
+
+    def __init__(self, tokens):
+        self.block = None
+        self.color_names = None
+        self.compiled = None
+        # results of Py3.format_contains()
+        self.contains = {}
+        # memoized output by memo_key, see Formatter.format()
+        self.memo = {}
+        # colors that are looked up on the module
+        self.module_colors = None
+        self.placeholders = None
+        self.tokens = tokens
+
+
+class FormatCache:
+    """
+    Least recently used cache of ParsedFormats shared by all modules.  Modules
+    that build their format strings as they run would otherwise fill it
+    without limit.
+    """
+
+    def __init__(self, size=FORMAT_CACHE_SIZE):
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self.hits = 0
+        self.lock = Lock()
+        self.misses = 0
+        self.size = size
+
+    def get(self, format_string, stats=None):
+        """
+        Return the ParsedFormat for the format string.  Hits, misses and
+        evictions are counted in the module stats if given.
+        """
+        with self.lock:
+            parsed = self.entries.get(format_string)
+            if parsed is not None:
+                self.entries.move_to_end(format_string)
+                self.hits += 1
+        if parsed is not None:
+            if stats:
+                stats.count("format_cache_hits")
+            return parsed
+
+        # tokenizing is slow so is done outside of the lock
+        parsed = ParsedFormat(list(Formatter.reg_ex.finditer(format_string)))
+        with self.lock:
+            # another thread may have added it meanwhile
+            parsed = self.entries.setdefault(format_string, parsed)
+            self.misses += 1
+            evicted = self.trim()
+        if stats:
+            stats.count("format_cache_misses")
+            if evicted:
+                stats.count("format_cache_evictions", evicted)
+        return parsed
+
+    def set_size(self, size):
+        """
+        Change the number of format strings kept.
+        """
+        with self.lock:
+            self.size = size
+            self.trim()
+
+    def trim(self):
+        """
+        Drop the least recently used entries over the size, the lock must be
+        held.  Returns the number dropped.
+        """
+        evicted = 0
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def as_dict(self):
+        return {
+            "entries": len(self.entries),
+            "evictions": self.evictions,
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": self.size,
+        }
+
+
 class Formatter:
     """
     Formatter for processing format strings via the format method.
+
+    Format strings are parsed into a tree of Blocks which is compiled into
+    closures by compile_block() unless compiled is False.  What is parsed is
+    kept in the FormatCache shared by all Formatters, hits and misses are
+    counted in stats if given.
     """
 
     TOKENS = [
@@ -48,29 +159,36 @@ class Formatter:
 
     reg_ex = re.compile(TOKENS[0], re.M | re.I)
 
-    block_cache = {}
-    format_string_cache = {}
+    cache = FormatCache()
 
-    def __init__(self, py3_wrapper=None):
+    def __init__(self, py3_wrapper=None, compiled=True, stats=None):
+        self.compiled = compiled
         self.py3_wrapper = py3_wrapper
+        self.stats = stats
+
+    def parse(self, format_string):
+        """
+        Get the ParsedFormat for the format_string from the cache.
+        """
+        return self.cache.get(format_string, self.stats)
 
     def tokens(self, format_string):
         """
         Get the tokenized format_string.
         Tokenizing is resource intensive so we only do it once and cache it
         """
-        if format_string not in self.format_string_cache:
-            tokens = list(re.finditer(self.reg_ex, format_string))
-            self.format_string_cache[format_string] = tokens
-        return self.format_string_cache[format_string]
+        return self.parse(format_string).tokens
 
     def get_color_names(self, format_string):
         """
         Parses the format_string and returns a set of color names.
         """
+        parsed = self.parse(format_string)
+        if parsed.color_names is not None:
+            return parsed.color_names
         names = set()
         # Tokenize the format string and process them
-        for token in self.tokens(format_string):
+        for token in parsed.tokens:
             if token.group("command"):
                 name = dict(parse_qsl(token.group("command"))).get("color")
                 if (
@@ -81,15 +199,19 @@ class Formatter:
                 ):
                     continue
                 names.add(name)
+        parsed.color_names = names
         return names
 
     def get_placeholders(self, format_string):
         """
         Parses the format_string and returns a set of placeholders.
         """
+        parsed = self.parse(format_string)
+        if parsed.placeholders is not None:
+            return parsed.placeholders
         placeholders = set()
         # Tokenize the format string and process them
-        for token in self.tokens(format_string):
+        for token in parsed.tokens:
             if token.group("placeholder"):
                 placeholders.add(token.group("key"))
             elif token.group("command"):
@@ -99,6 +221,7 @@ class Formatter:
                 if_ = commands.get("if")
                 if if_:
                     placeholders.add(Condition(if_).variable)
+        parsed.placeholders = placeholders
         return placeholders
 
     def get_placeholder_formats_list(self, format_string):
@@ -179,16 +302,62 @@ class Formatter:
             output.append(value)
         return "".join(output)
 
-    def build_block(self, format_string):
+    def fingerprint(self, format_string, parsed, module, param_dict):
+        """
+        Return the values that the output of the format depends on, so that
+        if they are unchanged the output is too.  None is returned if any of
+        them cannot be compared cheaply eg lists.
+        """
+        placeholders = parsed.placeholders
+        if placeholders is None:
+            placeholders = self.get_placeholders(format_string)
+        if parsed.module_colors is None:
+            names = set()
+            for token in parsed.tokens:
+                if token.group("command"):
+                    commands = dict(parse_qsl(token.group("command")))
+                    color = expand_color(commands.get("color"), passthrough=True)
+                    if color and color[0] != "#":
+                        names.add(color)
+            parsed.module_colors = names
+
+        values = []
+        for key in placeholders:
+            if key in param_dict:
+                value = param_dict[key]
+            else:
+                try:
+                    value = getattr(module, key, MISSING)
+                except Exception:
+                    # eg a property that failed
+                    return None
+                if value is MISSING:
+                    # not the same as None, a missing placeholder is shown
+                    values.append(MISSING)
+                    continue
+            value_type = type(value)
+            if value_type is Composite:
+                value = tuple(tuple(part.items()) for part in value.get_content())
+            elif value_type not in SCALAR_TYPES:
+                return None
+            # the type is kept as eg 1 == True but they are shown differently
+            values.append((value_type, value))
+        for name in parsed.module_colors:
+            values.append(get_module_color(name, module))
+        return tuple(values)
+
+    def build_block(self, format_string, parsed=None):
         """
         Parse the format string into blocks containing Literals, Placeholders
         etc that we can cache and reuse.
         """
+        if parsed is None:
+            parsed = self.parse(format_string)
         first_block = Block(None, py3_wrapper=self.py3_wrapper)
         block = first_block
 
         # Tokenize the format string and process them
-        for token in self.tokens(format_string):
+        for token in parsed.tokens:
             value = token.group(0)
             if token.group("block_start"):
                 # Create new block
@@ -225,7 +394,8 @@ class Formatter:
         if block.parent:
             raise Exception("Block not closed")
         # add to the cache
-        self.block_cache[format_string] = first_block
+        parsed.block = first_block
+        return first_block
 
     def format(
         self,
@@ -234,20 +404,43 @@ class Formatter:
         param_dict=None,
         force_composite=False,
         attr_getter=None,
+        memo_key=None,
     ):
         """
         Format a string, substituting place holders which can be found in
         param_dict, attributes of the supplied module, or provided via calls to
         the attr_getter function.
+
+        If a memo_key is given the output is kept and returned again, without
+        rendering, while the values of the placeholders and colors used are
+        unchanged.  Each caller should use its own memo_key.  The output is
+        not memoized if an attr_getter is used as its values are not known.
         """
         if param_dict is None:
             param_dict = {}
 
         # if the processed format string is not in the cache then create it.
-        if format_string not in self.block_cache:
-            self.build_block(format_string)
-
-        first_block = self.block_cache[format_string]
+        parsed = self.parse(format_string)
+
+        fingerprint = None
+        if memo_key is not None and attr_getter is None:
+            fingerprint = self.fingerprint(format_string, parsed, module, param_dict)
+        if fingerprint is not None:
+            memo_key = (memo_key, force_composite)
+            memo = parsed.memo.get(memo_key)
+            if memo and memo[0] == fingerprint:
+                if self.stats:
+                    self.stats.count("format_memo_hits")
+                return copy_output(memo[1])
+
+        first_block = parsed.block
+        if first_block is None:
+            first_block = self.build_block(format_string, parsed)
+
+        if self.compiled:
+            if parsed.compiled is None:
+                parsed.compiled = compile_block(first_block)
+            first_block = parsed.compiled
 
         def get_parameter(key):
             """
@@ -288,6 +481,10 @@ class Formatter:
             else:
                 output = ""
 
+        if fingerprint is not None:
+            if self.stats:
+                self.stats.count("format_memo_misses")
+            parsed.memo[memo_key] = (fingerprint, copy_output(output))
         return output
 
 
@@ -609,81 +806,305 @@ class Block:
         # clean
         color = self.commands.color
         if color and color[0] != "#":
-            color_name = f"color_{color}"
-            threshold_color_name = f"color_threshold_{color}"
-            # substitute color
-            color = (
-                getattr(module, color_name, None)
-                or getattr(module, threshold_color_name, None)
-                or getattr(module.py3, color_name.upper(), None)
-            )
+            color = get_module_color(color, module)
             if color == "hidden":
                 return False, []
 
-        text = ""
-        out = []
         if isinstance(output, str):
             output = [output]
 
-        # merge as much output as we can.
-        first = True
-        last_block = None
-        for index, item in enumerate(output):
-            is_block = isinstance(item, Block)
-            if not is_block and item:
-                last_block = None
-            if isinstance(item, (str, bool, int, float, bytes)) or item is None:
-                text += str(item)
+        valid, out = merge_output(output, color, valid, get_params, module)
+        set_lengths(out, self.commands.max_length, self.commands.min_length)
+        return valid, out
+
+
+def copy_output(output):
+    """
+    Copy the output of Formatter.format() so that it can be changed.
+    """
+    if isinstance(output, Composite):
+        return output.copy()
+    return output
+
+
+def get_module_color(color, module):
+    """
+    Get the color for a named color eg `good` from the module.
+    """
+    color_name = f"color_{color}"
+    threshold_color_name = f"color_threshold_{color}"
+    return (
+        getattr(module, color_name, None)
+        or getattr(module, threshold_color_name, None)
+        or getattr(module.py3, color_name.upper(), None)
+    )
+
+
+def merge_output(output, color, valid, get_params, module):
+    """
+    Merge the output of a block into as few composite parts as we can.
+    Soft blocks are rendered here if there is output either side of them.
+    """
+    text = ""
+    out = []
+
+    first = True
+    last_block = None
+    for index, item in enumerate(output):
+        is_block = isinstance(item, (Block, CompiledBlock))
+        if not is_block and item:
+            last_block = None
+        if isinstance(item, (str, bool, int, float, bytes)) or item is None:
+            text += str(item)
+            continue
+        elif text:
+            if not first and (text == "" or out and out[-1].get("color") == color):
+                out[-1]["full_text"] += text
+            else:
+                part = {"full_text": text}
+                if color:
+                    part["color"] = color
+                out.append(part)
+            text = ""
+        if isinstance(item, Composite):
+            if color:
+                item.composite_update(item, {"color": color}, soft=True)
+            out.extend(item.get_content())
+        elif is_block:
+            # if this is a block then likely it is soft.
+            if not out:
                 continue
-            elif text:
-                if not first and (text == "" or out and out[-1].get("color") == color):
-                    out[-1]["full_text"] += text
+            for other in output[index + 1 :]:
+                if other and not isinstance(other, (Block, CompiledBlock)):
+                    valid, _output = item.render(get_params, module, _if=True)
+                    if _output and _output != last_block:
+                        last_block = _output
+                        out.extend(_output)
+                    break
+        else:
+            if item:
+                out.append(item)
+        first = False
+
+    # add any left over text
+    if text:
+        part = {"full_text": text}
+        if color:
+            part["color"] = color
+        out.append(part)
+    return valid, out
+
+
+def set_lengths(out, max_length, min_length):
+    """
+    Process any min/max length commands.
+    """
+    if max_length or min_length:
+        for item in out:
+            if max_length is not None:
+                item["full_text"] = item["full_text"][:max_length]
+                max_length -= len(item["full_text"])
+            if min_length:
+                min_length -= len(item["full_text"])
+        if min_length > 0:
+            out[0]["full_text"] = " " * min_length + out[0]["full_text"]
+
+
+# a placeholder that has no value, see Formatter.fingerprint()
+MISSING = object()
+
+# output of these types is simply joined as text
+SCALAR_TYPES = frozenset([str, bool, int, float, bytes, type(None)])
+
+LITERAL, PLACEHOLDER, SUB_BLOCK = range(3)
+
+
+class CompiledBlock:
+    """
+    A Block compiled into a closure by compile_block().
+    """
+
+    __slots__ = ["render"]
+
+
+def compile_placeholder(placeholder, not_zero):
+    """
+    Compile a Placeholder into a function that returns the same as
+    Placeholder.get() with the format already worked out.
+    """
+    key = placeholder.key
+    format = placeholder.format
+    missing = f"{{{key}}}"
+
+    if not_zero:
+        invalid = ["", None, False, "0", "0.0", 0, 0.0]
+
+        def is_valid(value):
+            return value not in invalid
+
+    else:
+
+        def is_valid(value):
+            # '', None, and False are ignored
+            # numbers like 0 and 0.0 are not.
+            return not (value in ["", None] or value is False)
+
+    if format.startswith(":"):
+        escape_ = "escape" in format
+        ceil_ = "ceil" in format
+        float_ = "f" in format or "g" in format
+        int_ = "d" in format
+        template = f"{{[{key}]{format}}}"
+
+        def get(get_params):
+            value = missing
+            try:
+                value = value_ = get_params(key)
+                try:
+                    if escape_:
+                        value = escape(value)
+                    if ceil_:
+                        value = ceil(float(value))
+                    if float_:
+                        value = float(value)
+                    if int_:
+                        value = int(float(value))
+                    value = template.format({key: value})
+                    value_ = float(value)
+                except ValueError:
+                    pass
+                return is_valid(value_), value, False
+            except:  # noqa e722
+                return False, value, True
+
+    elif format.startswith("!"):
+        template = f"{{{key}{format}}}"
+
+        def get(get_params):
+            value = missing
+            try:
+                value = get_params(key)
+                value = template.format(**{key: value})
+                return is_valid(value), value, False
+            except:  # noqa e722
+                return False, value, True
+
+    else:
+
+        def get(get_params):
+            value = missing
+            try:
+                value = get_params(key)
+                return is_valid(value), value, False
+            except:  # noqa e722
+                return False, value, True
+
+    return get
+
+
+def compile_block(block):
+    """
+    Compile a Block into a CompiledBlock whose render() returns the same as
+    Block.render().  The commands, colors and placeholder formats are worked
+    out once here rather than on every render and output that is only text
+    is joined directly.
+    """
+    compiled = CompiledBlock()
+    commands = block.commands
+    condition = commands._if
+    show = True if commands.show else None
+    soft = bool(block.parent and commands.soft)
+    # the first block is valid if it has enough output or is a switch
+    first_block = block.parent is None
+    base_block = bool(block.base_block)
+    max_length = commands.max_length
+    min_length = commands.min_length
+    has_lengths = bool(max_length or min_length)
+
+    color = commands.color
+    color_name = None
+    if color and color[0] != "#":
+        color_name = color
+        color = None
+
+    next_render = None
+    if block.next_block:
+        next_render = compile_block(block.next_block).render
+
+    # merge literals next to each other
+    content = []
+    for item in block.content:
+        if isinstance(item, Literal):
+            if content and content[-1][0] == LITERAL:
+                content[-1] = (LITERAL, content[-1][1] + item.text)
+            else:
+                content.append((LITERAL, item.text))
+        elif isinstance(item, Placeholder):
+            content.append((PLACEHOLDER, compile_placeholder(item, commands.not_zero)))
+        elif isinstance(item, Block):
+            content.append((SUB_BLOCK, compile_block(item).render))
+
+    def render(get_params, module, _if=None):
+        if soft and _if is None:
+            return None, compiled
+        if _if:
+            valid = True
+        elif condition:
+            valid = condition.check_valid(get_params)
+        else:
+            valid = show
+
+        enough = False
+        output = []
+        if valid is not False:
+            for kind, item in content:
+                if kind == LITERAL:
+                    enough = True
+                    output.append(item)
+                    # text turns an invalid placeholder into no decision
+                    valid = valid or None
+                elif kind == PLACEHOLDER:
+                    sub_valid, sub_output, enough = item(get_params)
+                    output.append(sub_output)
+                    valid = valid or sub_valid
                 else:
-                    part = {"full_text": text}
-                    if color:
-                        part["color"] = color
-                    out.append(part)
-                text = ""
-            if isinstance(item, Composite):
-                if color:
-                    item.composite_update(item, {"color": color}, soft=True)
-                out.extend(item.get_content())
-            elif is_block:
-                # if this is a block then likely it is soft.
-                if not out:
-                    continue
-                for other in output[index + 1 :]:
-                    if other and not isinstance(other, Block):
-                        valid, _output = item.render(get_params, module, _if=True)
-                        if _output and _output != last_block:
-                            last_block = _output
-                            out.extend(_output)
-                        break
+                    sub_valid, sub_output = item(get_params, module)
+                    if sub_valid is None:
+                        output.append(sub_output)
+                    else:
+                        output.extend(sub_output)
+                    valid = valid or sub_valid
+        if not valid:
+            if next_render:
+                valid, output = next_render(get_params, module, _if=condition)
+            elif first_block and (enough or base_block):
+                valid = True
             else:
-                if item:
-                    out.append(item)
-            first = False
+                output = []
 
-        # add any left over text
-        if text:
-            part = {"full_text": text}
-            if color:
-                part["color"] = color
-            out.append(part)
-
-        # process any min/max length commands
-        max_length = self.commands.max_length
-        min_length = self.commands.min_length
-
-        if max_length or min_length:
-            for item in out:
-                if max_length is not None:
-                    item["full_text"] = item["full_text"][:max_length]
-                    max_length -= len(item["full_text"])
-                if min_length:
-                    min_length -= len(item["full_text"])
-            if min_length > 0:
-                out[0]["full_text"] = " " * min_length + out[0]["full_text"]
-                min_length = 0
+        block_color = color
+        if color_name:
+            block_color = get_module_color(color_name, module)
+            if block_color == "hidden":
+                return False, []
 
+        for item in output:
+            if type(item) not in SCALAR_TYPES:
+                valid, out = merge_output(output, block_color, valid, get_params, module)
+                break
+        else:
+            # only text so no merging is needed
+            out = []
+            text = "".join(map(str, output))
+            if text:
+                part = {"full_text": text}
+                if block_color:
+                    part["color"] = block_color
+                out.append(part)
+
+        if has_lengths:
+            set_lengths(out, max_length, min_length)
         return valid, out
+
+    compiled.render = render
+    return compiled
@@ -1,14 +1,16 @@
 import logging
+import os
+import select
 import sys
 import time
 from copy import deepcopy
 from datetime import datetime, timezone
-from json import loads
 from signal import SIG_IGN, SIGSTOP, SIGTSTP, SIGUSR1, signal
 from subprocess import PIPE, Popen
 from tempfile import NamedTemporaryFile
-from threading import Thread
+from threading import Event, Thread
 
+from py3status import codec
 from py3status.constants import (
     I3S_ALLOWED_COLORS,
     I3S_COLOR_MODULES,
@@ -16,12 +18,14 @@ from py3status.constants import (
     TIME_MODULES,
     TZTIME_FORMAT,
 )
-from py3status.events import IOPoller
 from py3status.profiling import profile
 from py3status.py3 import Py3
 
 logger = logging.getLogger(__name__)
 
+# how much to read from i3status at a time
+READ_SIZE = 65536
+
 
 class I3statusModule:
     """
@@ -244,9 +248,13 @@ class I3status(Thread):
         self.py3_wrapper = py3_wrapper
         self.ready = False
         self.standalone = py3_wrapper.config["standalone"]
+        # set once i3status is giving us output or has failed to
+        self.startup_done = Event()
         self.time_modules = []
         self.tmpfile_path = None
         self.update_due = 0
+        # written to by stop() to wake the thread
+        self.wake_read, self.wake_write = os.pipe()
 
         # the update interval is useful to know
         self.update_interval = self.py3_wrapper.get_config_attribute("general", "interval")
@@ -352,19 +360,79 @@ class I3status(Thread):
                 self.i3status_pipe.send_signal(SIGUSR1)
             self.last_refresh_ts = time.monotonic()
 
+    def stop(self):
+        """
+        Wake the thread so that it sees py3status is stopping.
+        """
+        os.write(self.wake_write, b"x")
+
     @profile
     def run(self):
         # if the i3status process dies we want to restart it.
         # We give up restarting if we have died too often
-        for _ in range(10):
-            if not self.py3_wrapper.running:
-                break
-            self.spawn_i3status()
-            # check if we never worked properly and if so quit now
-            if not self.ready:
+        try:
+            for _ in range(10):
+                if not self.py3_wrapper.running:
+                    break
+                self.spawn_i3status()
+                # check if we never worked properly and if so quit now
+                if not self.ready:
+                    break
+                # limit restart rate
+                self.lock.wait(5)
+        finally:
+            self.startup_done.set()
+
+    def read_i3status(self, i3status_pipe):
+        """
+        Read the output of i3status as it arrives.  There is no timeout, the
+        thread sleeps until i3status writes something, exits or we are woken
+        by stop().
+        """
+        stdout = i3status_pipe.stdout.fileno()
+        stderr = i3status_pipe.stderr.fileno()
+        poller = select.poll()
+        for fd in [stdout, stderr, self.wake_read]:
+            poller.register(fd, select.POLLIN)
+        pending = b""
+        error = b""
+        while self.py3_wrapper.running:
+            ready = dict(poller.poll())
+            if self.wake_read in ready:
                 break
-            # limit restart rate
-            self.lock.wait(5)
+            if ready.get(stderr):
+                data = os.read(stderr, READ_SIZE)
+                if data:
+                    error = (error + data)[:READ_SIZE]
+                else:
+                    poller.unregister(stderr)
+            if not ready.get(stdout):
+                continue
+            data = os.read(stdout, READ_SIZE)
+            if not data:
+                # i3status has closed its output so is exiting
+                code = i3status_pipe.wait()
+                err = error.decode("utf-8", "replace").strip()
+                if err:
+                    msg = err.splitlines()[0].split("i3status", 1)[-1].strip(" .:")
+                else:
+                    msg = f"exiting due to code {code}"
+                raise OSError(msg)
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                line = line.decode("utf-8", "replace").strip()
+                # remove leading comma if present
+                if line[:1] == ",":
+                    line = line[1:]
+                if line.startswith("[{"):
+                    json_list = codec.loads(line)
+                    self.last_output = json_list
+                    self.set_responses(json_list)
+                    if not self.ready:
+                        self.ready = True
+                        self.startup_done.set()
+                        self.py3_wrapper.startup_profile.milestone("first i3status line")
 
     def spawn_i3status(self):
         """
@@ -374,45 +442,24 @@ class I3status(Thread):
             with NamedTemporaryFile(prefix="py3status_") as tmpfile:
                 self.write_tmp_i3status_config(tmpfile)
 
-                i3status_pipe = Popen(
-                    [self.i3status_path, "-c", tmpfile.name],
-                    stdout=PIPE,
-                    stderr=PIPE,
-                    # Ignore the SIGTSTP signal for this subprocess
-                    preexec_fn=lambda: signal(SIGTSTP, SIG_IGN),
-                )
+                with self.py3_wrapper.startup_profile.stage("i3status spawn"):
+                    i3status_pipe = Popen(
+                        [self.i3status_path, "-c", tmpfile.name],
+                        stdout=PIPE,
+                        stderr=PIPE,
+                        # Ignore the SIGTSTP signal for this subprocess
+                        preexec_fn=lambda: signal(SIGTSTP, SIG_IGN),
+                    )
 
                 logger.info("started with config file: %s", tmpfile.name)
 
-                self.poller_inp = IOPoller(i3status_pipe.stdout)
-                self.poller_err = IOPoller(i3status_pipe.stderr)
                 self.tmpfile_path = tmpfile.name
 
                 # Store the pipe so we can signal it
                 self.i3status_pipe = i3status_pipe
 
                 try:
-                    # loop on i3status output
-                    while self.py3_wrapper.running:
-                        line = self.poller_inp.readline()
-                        if line:
-                            # remove leading comma if present
-                            if line[0] == ",":
-                                line = line[1:]
-                            if line.startswith("[{"):
-                                json_list = loads(line)
-                                self.last_output = json_list
-                                self.set_responses(json_list)
-                                self.ready = True
-                        else:
-                            err = self.poller_err.readline()
-                            code = i3status_pipe.poll()
-                            if code is not None:
-                                if err:
-                                    msg = err.split("i3status", 1)[-1].strip(" .:")
-                                else:
-                                    msg = f"exiting due to code {code}"
-                                raise OSError(msg)
+                    self.read_i3status(i3status_pipe)
                 except OSError:
                     err = sys.exc_info()[1]
                     self.error = err
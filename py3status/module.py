@@ -4,15 +4,27 @@ import time
 from collections import OrderedDict
 from importlib.machinery import SourceFileLoader
 from pathlib import Path
-from random import randint
+from random import randint, uniform
 from types import FunctionType
 
 from py3status.composite import Composite
-from py3status.constants import MARKUP_LANGUAGES, ON_ERROR_VALUES, POSITIONS
+from py3status.constants import (
+    BACKOFF_JITTER,
+    BACKOFF_MAX,
+    EXECUTION_VALUES,
+    MARKUP_LANGUAGES,
+    ON_ERROR_VALUES,
+    POSITIONS,
+    RUN_DEADLINE,
+    STALE_COLOR,
+)
 from py3status.formatter import Formatter
 from py3status.log import module_logger_name
+from py3status.module_process import ModuleProcess
 from py3status.profiling import profile
 from py3status.py3 import ModuleErrorException, Py3
+from py3status.scheduler import LANE_URGENT
+from py3status.stats import ModuleStats
 
 
 def make_quotes(options):
@@ -22,6 +34,38 @@ def make_quotes(options):
     return " or ".join(x)
 
 
+class MethodRunner:
+    """
+    A method of a module as an item in the timeout queue, so that each method
+    is run when it is due rather than all of the module's methods being
+    checked whenever the module is.  It has the module's name so that the
+    methods of a module never run at the same time.
+    """
+
+    def __init__(self, module, method):
+        self.method = method
+        self.module = module
+        self.module_full_name = module.module_full_name
+        # each method backs off on its own while it keeps failing
+        self.backoff_delay = None
+        self.backoff_failures = 0
+
+    @property
+    def is_async(self):
+        # only async methods are run on the asyncio loop
+        return self.module.has_async and self.module.methods[self.method]["is_async"]
+
+    @property
+    def timer_slack(self):
+        return self.module.timer_slack
+
+    def run(self):
+        self.module.run(self.method)
+
+    async def run_async(self):
+        await self.module.run_async(self.method)
+
+
 class Module:
     """
     This class represents a user module (imported file).
@@ -39,17 +83,29 @@ class Module:
         """
         self.allow_config_clicks = True
         self.allow_urgent = None
+        self.backoff_max = BACKOFF_MAX
         self.cache_time = None
         self.click_events = False
         self.config = py3_wrapper.config
+        self.deadline_rerun = False
         self.disabled = False
         self.enabled = False
         self.error_messages = None
         self.error_hide = False
         self.has_post_config_hook = False
         self.has_kill = False
+        self.hidden = False
+        self.hidden_interval = 0
+        self.hidden_pause = False
         self.i3status_thread = py3_wrapper.i3status_thread
+        self.has_async = False
         self.last_output = []
+        # the versions of the methods' output that last_output is made from
+        self.last_output_versions = None
+        self.lazy = False
+        self.loaded = False
+        self.memoize_format = False
+        self.method_runners = {}
         self.methods = OrderedDict()
         self.module_class = instance
         self.module_full_name = module
@@ -59,8 +115,13 @@ class Module:
         self.nagged = False
         self.on_error = None
         self.prevent_refresh = False
+        self.process = None
+        self.run_deadline = RUN_DEADLINE
         self.sleeping = False
+        self.stale = False
+        self.stats = ModuleStats()
         self.terminated = False
+        self.timer_slack = None
         self.testing = self.config.get("testing")
         self.urgent = False
         self.i3bar_gaps_urgent_options = {}
@@ -80,12 +141,46 @@ class Module:
         self.module_logger_name = module_logger_name(self.module_full_name)
         self._logger = logging.getLogger(self.module_logger_name)
 
+        # modules set to lazy_load are not imported until they can be seen,
+        # containers are always loaded as they decide what can be seen.
+        py3_config = self.config["py3_config"]
+        lazy_load = py3_wrapper.get_config_attribute(module, "lazy_load")
+        if not hasattr(lazy_load, "none_setting"):
+            if not isinstance(lazy_load, bool):
+                err = "Invalid `lazy_load` attribute, should be a boolean. "
+                err += f"Got `{lazy_load}`."
+                raise TypeError(err)
+            self.lazy = lazy_load and "items" not in py3_config.get(module, {})
+
+        if self.lazy:
+            self.discoverable_modules = discoverable_modules
+            # modules in a container are hidden until it shows them
+            self.hidden = module in py3_config[".module_groups"]
+            self.last_output = [
+                {
+                    "full_text": self.module_nice_name,
+                    "instance": self.module_inst,
+                    "name": self.module_name,
+                }
+            ]
+        else:
+            self.load_module(discoverable_modules)
+
+    def __repr__(self):
+        return f"<Module {self.module_full_name}>"
+
+    def load_module(self, discoverable_modules):
+        """
+        Load the module's class and read its methods and options.
+        """
+        self.loaded = True
+        module = self.module_full_name
         try:
             self.load_methods(module, discoverable_modules)
         except Exception as e:
             # Import failed notify user in module error output
             self.disabled = True
-            self.methods["error"] = {}
+            self.methods["error"] = {"last_output": {}, "version": 0}
             self.error_index = 0
             self.error_messages = [
                 self.module_nice_name,
@@ -107,8 +202,34 @@ class Module:
         if not self.disabled:
             self.set_module_options(module)
 
-    def __repr__(self):
-        return f"<Module {self.module_full_name}>"
+    def load_lazy(self):
+        """
+        Load and start a lazy loaded module now that it can be seen.
+        """
+        start_time = time.perf_counter()
+        try:
+            self.load_module(self.discoverable_modules)
+        except Exception as e:
+            # invalid module options
+            self.disabled = True
+            self._logger.error("could not be loaded (%s)", e)
+            self.error_output(f"{self.module_nice_name}: {e}")
+            return
+        if self.disabled:
+            # the import failed
+            return
+        load_time = time.perf_counter() - start_time
+        self._logger.info("loaded lazily in %.3fs", load_time)
+        self._py3_wrapper.startup_profile.add_module(self.module_full_name, "import", load_time)
+        if not self.methods:
+            # nothing to run so remove the placeholder
+            self.last_output = []
+            self._py3_wrapper.notify_update(self.module_full_name)
+            return
+        self.prepare_module()
+        if not (self.disabled or self.terminated):
+            self._logger.info("starting module")
+            self._py3_wrapper.timeout_queue_add(self)
 
     @classmethod
     def load_from_file(cls, filepath):
@@ -145,6 +266,7 @@ class Module:
         # its main method(s) called for the first time.  This allows modules to
         # perform any necessary setup.
         if self.has_post_config_hook:
+            start_time = time.perf_counter()
             try:
                 self.module_class.post_config_hook()
             except Exception as e:
@@ -162,6 +284,10 @@ class Module:
                     "post_config_hook failed", notify_user=False, name=self.module_logger_name
                 )
                 self._logger.error("terminating module")
+            self._py3_wrapper.startup_profile.add_module(
+                self.module_full_name, "post_config_hook", time.perf_counter() - start_time
+            )
+        self._py3_wrapper.startup_profile.module_started(self.module_full_name)
         self.enabled = True
 
     def runtime_error(self, msg, method):
@@ -185,7 +311,30 @@ class Module:
         if self.error_messages != errors:
             self.error_messages = errors
             self.error_index = 0
-        self.error_output(self.error_messages[self.error_index], method)
+        message = self.error_messages[self.error_index]
+        # let the user know we are backing off
+        runner = self.method_runners.get(method)
+        if runner and runner.backoff_delay:
+            message += f" (retry in {runner.backoff_delay:.0f}s)"
+        self.error_output(message, method)
+
+    def backoff_timeout(self, meth):
+        """
+        Return how long to wait before running a failing method again.
+        Each failed run in a row doubles the module's cache_timeout, up to
+        backoff_max, so we do not keep hammering a backend that is down.
+        """
+        runner = self.method_runners[meth]
+        timeout = getattr(self.module_class, "cache_timeout", self.config["cache_timeout"])
+        if not runner.backoff_failures:
+            runner.backoff_delay = None
+            return timeout
+        delay = timeout * 2 ** min(runner.backoff_failures, 32)
+        delay = min(delay, max(self.backoff_max, timeout))
+        # jitter so that modules using the same backend do not retry together
+        delay = max(timeout, delay * uniform(1 - BACKOFF_JITTER, 1))
+        runner.backoff_delay = delay
+        return delay
 
     def error_output(self, message, method_affected=None):
         """
@@ -213,7 +362,7 @@ class Module:
             ):
                 continue
 
-            method["last_output"] = [error]
+            self.set_method_output(method, [error])
 
         self.allow_config_clicks = False
         self.set_updated()
@@ -223,7 +372,7 @@ class Module:
         hide the module in the i3bar
         """
         for method in self.methods.values():
-            method["last_output"] = {}
+            self.set_method_output(method, {})
 
         self.allow_config_clicks = False
         self.error_hide = True
@@ -231,17 +380,22 @@ class Module:
 
     def start_module(self):
         """
-        Start the module running.
+        Start the module running.  Lazy loaded modules are only loaded and
+        started once they can be seen.
         """
+        if self.lazy:
+            if not (self.loaded or self.hidden):
+                self._py3_wrapper.timeout_queue_add(self)
+            return
         self.prepare_module()
         if not (self.disabled or self.terminated):
             # Start the module and call its output method(s)
             self._logger.info("starting module")
             self._py3_wrapper.timeout_queue_add(self)
 
-    def force_update(self):
+    def force_update(self, lane=LANE_URGENT, delay=0):
         """
-        Forces an update of the module.
+        Forces an update of the module, after delay seconds if given.
         """
         if self.disabled or self.terminated or not self.enabled:
             return
@@ -253,11 +407,31 @@ class Module:
                 meth,
             )
         # set module to update
-        self._py3_wrapper.timeout_queue_add(self)
+        cache_time = time.monotonic() + delay if delay else 0
+        self._py3_wrapper.timeout_queue_add(self, cache_time, lane=lane)
 
     def sleep(self):
         self.sleeping = True
 
+    def set_hidden(self, hidden):
+        """
+        The module has been hidden or shown by its container.  Hidden
+        modules can be run less often or not at all, once shown again they
+        go back to their normal schedule, running now if they are overdue.
+        """
+        self.hidden = hidden
+        if not (hidden or self.loaded):
+            # a lazy loaded module is loaded the first time it is shown
+            self._py3_wrapper.timeout_queue_add(self, lane=LANE_URGENT)
+            return
+        if hidden or not (self.hidden_interval or self.hidden_pause):
+            return
+        if self.disabled or self.terminated or not self.enabled:
+            return
+        if self.cache_time is None:
+            return
+        self._schedule_methods(self.methods, lane=LANE_URGENT)
+
     def disable_module(self):
         # hide message
         self.disabled = True
@@ -273,11 +447,17 @@ class Module:
             return
         if self.cache_time is None:
             return
-        # new style modules can signal they want to cache forever
-        if self.cache_time == Py3.CACHE_FOREVER:
-            return
         # restart
-        self._py3_wrapper.timeout_queue_add(self, self.cache_time)
+        self._schedule_methods(self.methods)
+
+    def set_method_output(self, method, output):
+        """
+        Store the output of a method.  The method's version is only changed if
+        the output has, so that set_updated() only needs to compare versions.
+        """
+        if output != method["last_output"]:
+            method["last_output"] = output
+            method["version"] += 1
 
     def set_updated(self):
         """
@@ -285,6 +465,13 @@ class Module:
         We check if the actual content has changed and if so we trigger an
         update in py3status.
         """
+        # if no method's output has changed there is nothing to do
+        versions = [method["version"] for method in self.methods.values()]
+        if versions == self.last_output_versions and not self.testing:
+            self.stats.count("unchanged_output")
+            return
+        self.last_output_versions = versions
+
         # get latest output
         output = []
         for method in self.methods.values():
@@ -299,18 +486,55 @@ class Module:
                     if self.testing:
                         data["cached_until"] = method.get("cached_until")
                     output.append(data)
-        # if changed store and force display update.
-        if output != self.last_output:
-            # has the modules output become urgent?
-            # we only care the update that this happens
-            # not any after then.
-            urgent = True in [x.get("urgent") for x in output]
-            if urgent != self.urgent:
-                self.urgent = urgent
-            else:
-                urgent = False
-            self.last_output = output
-            self._py3_wrapper.notify_update(self.module_full_name, urgent)
+        # store and force display update.
+        # has the modules output become urgent?
+        # we only care the update that this happens
+        # not any after then.
+        urgent = True in [x.get("urgent") for x in output]
+        if urgent != self.urgent:
+            self.urgent = urgent
+        else:
+            urgent = False
+        self.last_output = output
+        self._py3_wrapper.notify_update(self.module_full_name, urgent)
+
+    def mark_stale(self):
+        """
+        The module is hung so show its output as stale.
+        """
+        self.stale = True
+        self.stats.count("deadlines_missed")
+        self.last_output = self.stale_output(self.last_output)
+        # so that set_updated() puts back the real output
+        self.last_output_versions = None
+        self._py3_wrapper.notify_update(self.module_full_name)
+
+    def stale_output(self, output):
+        """
+        Return the output in the color used for stale output.
+        """
+        color = self._py3_wrapper.get_config_attribute(self.module_full_name, "color_stale")
+        if hasattr(color, "none_setting"):
+            color = STALE_COLOR
+        return [dict(x, color=color) for x in output]
+
+    def has_current_output(self):
+        """
+        Check if the module's output is from a successful run that is not
+        hung, so it is worth saving in the snapshot.
+        """
+        if self.disabled or self.terminated or self.stale or self.error_messages:
+            return False
+        return self.last_output_versions is not None
+
+    def clear_stale(self):
+        """
+        The hung run has returned so show the current output again.
+        """
+        self.stale = False
+        self.set_updated()
+        if self.deadline_rerun:
+            self.force_update()
 
     def get_latest(self):
         """
@@ -419,6 +643,80 @@ class Module:
                     raise ValueError(err)
                 self.py3status_module_options["position"] = position
 
+        # backoff of failing modules
+        backoff_max = fn(self.module_full_name, "backoff_max")
+        if not hasattr(backoff_max, "none_setting"):
+            if isinstance(backoff_max, bool) or not isinstance(backoff_max, (int, float)):
+                err = "Invalid `backoff_max` attribute, should be a number. "
+                err += f"Got `{backoff_max}`."
+                raise TypeError(err)
+            self.backoff_max = backoff_max
+
+        # hung modules
+        run_deadline = fn(self.module_full_name, "run_deadline")
+        if not hasattr(run_deadline, "none_setting"):
+            if isinstance(run_deadline, bool) or not isinstance(run_deadline, (int, float)):
+                err = "Invalid `run_deadline` attribute, should be a number. "
+                err += f"Got `{run_deadline}`."
+                raise TypeError(err)
+            self.run_deadline = run_deadline
+
+        deadline_rerun = fn(self.module_full_name, "deadline_rerun")
+        if not hasattr(deadline_rerun, "none_setting"):
+            if not isinstance(deadline_rerun, bool):
+                err = "Invalid `deadline_rerun` attribute, should be a boolean. "
+                err += f"Got `{deadline_rerun}`."
+                raise TypeError(err)
+            self.deadline_rerun = deadline_rerun
+
+        # modules hidden by their container
+        hidden_interval = fn(self.module_full_name, "hidden_interval")
+        if not hasattr(hidden_interval, "none_setting"):
+            if isinstance(hidden_interval, bool) or not isinstance(hidden_interval, (int, float)):
+                err = "Invalid `hidden_interval` attribute, should be a number. "
+                err += f"Got `{hidden_interval}`."
+                raise TypeError(err)
+            self.hidden_interval = hidden_interval
+
+        hidden_pause = fn(self.module_full_name, "hidden_pause")
+        if not hasattr(hidden_pause, "none_setting"):
+            if not isinstance(hidden_pause, bool):
+                err = "Invalid `hidden_pause` attribute, should be a boolean. "
+                err += f"Got `{hidden_pause}`."
+                raise TypeError(err)
+            self.hidden_pause = hidden_pause
+
+        # run the module in a worker process
+        execution = fn(self.module_full_name, "execution")
+        if not hasattr(execution, "none_setting"):
+            if execution not in EXECUTION_VALUES:
+                err = "Invalid `execution` attribute, should be "
+                err += make_quotes(EXECUTION_VALUES)
+                err += f". Got `{execution}`."
+                raise ValueError(err)
+            if execution == "process":
+                self.process = ModuleProcess(self)
+                # async methods are run by the worker process
+                self.has_async = False
+
+        # timer slack
+        timer_slack = fn(self.module_full_name, "timer_slack")
+        if not hasattr(timer_slack, "none_setting"):
+            if isinstance(timer_slack, bool) or not isinstance(timer_slack, (int, float)):
+                err = "Invalid `timer_slack` attribute, should be a number. "
+                err += f"Got `{timer_slack}`."
+                raise TypeError(err)
+            self.timer_slack = timer_slack
+
+        # reuse the output of py3.safe_format() when its values are unchanged
+        memoize_format = fn(self.module_full_name, "memoize_format")
+        if not hasattr(memoize_format, "none_setting"):
+            if not isinstance(memoize_format, bool):
+                err = "Invalid `memoize_format` attribute, should be a boolean. "
+                err += f"Got `{memoize_format}`."
+                raise TypeError(err)
+            self.memoize_format = memoize_format
+
         # i3bar, py3status
         markup = fn(self.module_full_name, "markup")
         if not hasattr(markup, "none_setting"):
@@ -887,15 +1185,20 @@ class Module:
                         else:
                             # the method_obj stores infos about each method
                             # of this module.
+                            is_async = inspect.iscoroutinefunction(m_attr)
+                            self.has_async = self.has_async or is_async
                             method_obj = {
                                 "cached_until": time.monotonic(),
                                 "call_type": params_type,
                                 "instance": None,
+                                "is_async": is_async,
                                 "last_output": {"name": method, "full_text": ""},
                                 "method": method,
                                 "name": None,
+                                "version": 0,
                             }
                             self.methods[method] = method_obj
+                            self.method_runners[method] = MethodRunner(self, method)
 
         # done, log some debug info
         self._logger.debug(
@@ -927,18 +1230,24 @@ class Module:
                 if button != 2 or (self.terminated or self.disabled):
                     self.prevent_refresh = True
 
+            elif self.click_events and self.process:
+                self.prevent_refresh = self.process.call("click", event)
+                self.set_updated()
             elif self.click_events:
                 click_method = getattr(self.module_class, "on_click")
                 if self.click_events == self.PARAMS_NEW:
                     # new style modules
-                    click_method(event)
+                    result = click_method(event)
                 else:
                     # legacy modules had extra parameters passed
-                    click_method(
+                    result = click_method(
                         self.i3status_thread.json_list,
                         self.config["py3_config"]["general"],
                         event,
                     )
+                if inspect.iscoroutine(result):
+                    # async on_click, run it on the shared loop
+                    self._py3_wrapper.async_loop.run(result)
                 self.set_updated()
             else:
                 # nothing has happened so no need for refresh
@@ -949,158 +1258,268 @@ class Module:
                 name=self.module_logger_name,
             )
 
-    @profile
-    def run(self):
+    def _call_method(self, meth, my_method):
         """
-        On a timely fashion, execute every method found for this module.
-        We will respect and set a cache timeout for each method if the user
-        didn't already do so.
-        We will execute the 'kill' method of the module when we terminate.
+        Call the named module method, for async methods the coroutine is
+        returned.
         """
-        if self._py3_wrapper.running:
-            cache_time = None
-            # execute each method of this module
-            for meth, my_method in self.methods.items():
-                # always check py3status is running
-                if not self._py3_wrapper.running:
-                    break
-
-                # respect the cache set for this method
-                if time.monotonic() < my_method["cached_until"]:
-                    if not cache_time or my_method["cached_until"] < cache_time:
-                        cache_time = my_method["cached_until"]
-                    continue
+        if self.process:
+            return self.process.call("run", meth)
+        method = getattr(self.module_class, meth)
+        if my_method["call_type"] == self.PARAMS_NEW:
+            # new style modules
+            return method()
+        else:
+            # legacy modules had parameters passed
+            return method(
+                self.i3status_thread.json_list,
+                self.config["py3_config"]["general"],
+            )
 
-                try:
-                    # execute method and get its output
-                    method = getattr(self.module_class, meth)
-                    if my_method["call_type"] == self.PARAMS_NEW:
-                        # new style modules
-                        response = method()
-                    else:
-                        # legacy modules had parameters passed
-                        response = method(
-                            self.i3status_thread.json_list,
-                            self.config["py3_config"]["general"],
-                        )
+    def _process_response(self, meth, my_method, response):
+        """
+        Validate and store the response of a module method.  Returns when the
+        method next wants to be run.
+        """
+        if isinstance(response, dict):
+            # this is a shiny new module giving a dict response
+            result = response
+        elif isinstance(response, tuple):
+            # this is an old school module reporting its position
+            position, result = response
+            if not isinstance(result, dict):
+                raise TypeError("response should be a dict")
+        else:
+            raise TypeError("response should be a dict")
 
-                    if isinstance(response, dict):
-                        # this is a shiny new module giving a dict response
-                        result = response
-                    elif isinstance(response, tuple):
-                        # this is an old school module reporting its position
-                        position, result = response
-                        if not isinstance(result, dict):
-                            raise TypeError("response should be a dict")
-                    else:
-                        raise TypeError("response should be a dict")
-
-                    if isinstance(response.get("full_text"), (list, Composite)):
-                        response["composite"] = response["full_text"]
-                        del response["full_text"]
-                    if "composite" in response:
-                        self.process_composite(response)
-                    else:
-                        # validate the response
-                        if "full_text" not in result:
-                            err = 'missing "full_text" key in response'
-                            raise KeyError(err)
-                        # Remove any none color from our output
-                        if hasattr(result.get("color"), "none_setting"):
-                            del result["color"]
-                        # remove urgent if not allowed
-                        if not self.allow_urgent and "urgent" in result:
-                            del result["urgent"]
-                        # set universal module options in result
-                        result.update(self.i3bar_module_options)
-
-                    result["instance"] = self.module_inst
-                    result["name"] = self.module_name
-
-                    # initialize method object
-                    if my_method["name"] is None:
-                        my_method["name"] = result["name"]
-                        if "instance" in result:
-                            my_method["instance"] = result["instance"]
-                        else:
-                            my_method["instance"] = result["name"]
-
-                    # update method object cache
-                    if "cached_until" in result:
-                        cached_until = result["cached_until"]
-                        # remove this so we can check later for output changes
-                        del result["cached_until"]
-                    else:
-                        # get module default cached_until
-                        cached_until = self.module_class.py3.time_in()
-                    my_method["cached_until"] = cached_until
-                    if not cache_time or cached_until < cache_time:
-                        cache_time = cached_until
-
-                    # update method object output
-                    if "composite" in response:
-                        my_method["last_output"] = result["composite"]
-                    else:
-                        my_method["last_output"] = result
-
-                    # debug info
-                    self._logger.debug(
-                        "method '%s' returned %s",
-                        meth,
-                        result,
-                    )
-                    # module working correctly so ensure module works as
-                    # expected
-                    self.allow_config_clicks = True
-                    self.error_messages = None
-                    self.error_hide = False
-
-                    # mark module as updated
-                    self.set_updated()
-
-                except ModuleErrorException as e:
-                    # module has indicated that it has an error
-                    self.runtime_error(e.msg, meth)
-                    if e.timeout:
-                        if e.timeout is Py3.CACHE_FOREVER:
-                            cache_time = Py3.CACHE_FOREVER
-                        else:
-                            cache_time = time.monotonic() + e.timeout
-                    else:
-                        cache_time = time.monotonic() + getattr(
-                            self.module_class,
-                            "cache_timeout",
-                            self.config["cache_timeout"],
-                        )
+        if isinstance(response.get("full_text"), (list, Composite)):
+            response["composite"] = response["full_text"]
+            del response["full_text"]
+        if "composite" in response:
+            self.process_composite(response)
+        else:
+            # validate the response
+            if "full_text" not in result:
+                err = 'missing "full_text" key in response'
+                raise KeyError(err)
+            # Remove any none color from our output
+            if hasattr(result.get("color"), "none_setting"):
+                del result["color"]
+            # remove urgent if not allowed
+            if not self.allow_urgent and "urgent" in result:
+                del result["urgent"]
+            # set universal module options in result
+            result.update(self.i3bar_module_options)
+
+        result["instance"] = self.module_inst
+        result["name"] = self.module_name
+
+        # initialize method object
+        if my_method["name"] is None:
+            my_method["name"] = result["name"]
+            if "instance" in result:
+                my_method["instance"] = result["instance"]
+            else:
+                my_method["instance"] = result["name"]
 
-                except Exception as e:
-                    if not self.testing:
-                        self._py3_wrapper.report_exception(
-                            f"user method '{meth}' failed",
-                            notify_user=False,
-                            name=self.module_logger_name,
-                        )
-                    # added error
-                    self.runtime_error(str(e) or e.__class__.__name__, meth)
-                    cache_time = time.monotonic() + getattr(
-                        self.module_class, "cache_timeout", self.config["cache_timeout"]
-                    )
+        # update method object cache
+        if "cached_until" in result:
+            cached_until = result["cached_until"]
+            # remove this so we can check later for output changes
+            del result["cached_until"]
+        else:
+            # get module default cached_until
+            cached_until = self.module_class.py3.time_in()
+        my_method["cached_until"] = cached_until
+
+        # update method object output
+        if "composite" in response:
+            self.set_method_output(my_method, result["composite"])
+        else:
+            self.set_method_output(my_method, result)
+
+        # debug info
+        self._logger.debug(
+            "method '%s' returned %s",
+            meth,
+            result,
+        )
+        # module working correctly so ensure module works as
+        # expected
+        self.allow_config_clicks = True
+        self.error_messages = None
+        self.error_hide = False
+
+        # mark module as updated
+        self.set_updated()
+        return cached_until
+
+    def _method_failed(self, meth, e):
+        """
+        Handle an exception raised by a module method.  Returns when the
+        method should next be run and if this counts as a failure for the
+        backoff.  This must be called from the except block.
+        """
+        self.stats.count("errors")
+        if isinstance(e, ModuleErrorException):
+            # module has indicated that it has an error
+            if e.timeout:
+                self.method_runners[meth].backoff_delay = None
+                if e.timeout is Py3.CACHE_FOREVER:
+                    cache_time = Py3.CACHE_FOREVER
+                else:
+                    cache_time = time.monotonic() + e.timeout
+                failed = False
+            else:
+                cache_time = time.monotonic() + self.backoff_timeout(meth)
+                failed = True
+            self.runtime_error(e.msg, meth)
+            return cache_time, failed
+
+        if not self.testing:
+            self._py3_wrapper.report_exception(
+                f"user method '{meth}' failed",
+                notify_user=False,
+                name=self.module_logger_name,
+            )
+        # added error
+        cache_time = time.monotonic() + self.backoff_timeout(meth)
+        self.runtime_error(str(e) or e.__class__.__name__, meth)
+        return cache_time, True
+
+    def _start_run(self, meth=None):
+        """
+        Record the stats for the start of a run and return the methods that
+        are due to be run, all of them or just meth if given.
+        """
+        start_time = time.monotonic()
+        self.stats.count("runs")
+        if meth is None:
+            methods = self.methods.items()
+        else:
+            methods = [(meth, self.methods[meth])]
+        # respect the cache set for each method
+        methods = [x for x in methods if x[1]["cached_until"] <= start_time]
+        # how late are we running compared to when we were due
+        if methods:
+            self.stats.record("lag", start_time - min(x[1]["cached_until"] for x in methods))
+        return start_time, methods
+
+    def _end_run(self, start_time, methods, failed):
+        """
+        Record the stats for the end of a run and schedule the methods for
+        when they are next due.  failed has whether each method that was run
+        failed.
+        """
+        # back off further while a method keeps failing
+        for meth, method_failed in failed.items():
+            runner = self.method_runners[meth]
+            if method_failed:
+                runner.backoff_failures += 1
+            else:
+                runner.backoff_failures = 0
+                runner.backoff_delay = None
+
+        self.stats.record("wall_time", time.monotonic() - start_time)
+
+        self._schedule_methods(methods)
+        # the module is next due when its first method is
+        due = [x["cached_until"] for x in self.methods.values()]
+        due = [x for x in due if x != Py3.CACHE_FOREVER]
+        self.cache_time = min(due) if due else Py3.CACHE_FOREVER
 
-            if cache_time is None:
-                cache_time = time.monotonic() + self.config["cache_timeout"]
-            self.cache_time = cache_time
+    def _schedule_methods(self, methods, lane=None):
+        """
+        Add the named methods to the timeout queue for when they are due.
+        """
+        now = time.monotonic()
+        for meth in methods:
+            runner = self.method_runners[meth]
+            cache_time = self.methods[meth]["cached_until"]
             # new style modules can signal they want to cache forever
             if cache_time == Py3.CACHE_FOREVER:
-                self._py3_wrapper.clear_timeout_due(self)
-                return
+                self._py3_wrapper.clear_timeout_due(runner)
+                continue
             # don't be hasty mate
             # set timeout to do update next time one is needed
             if not cache_time:
-                cache_time = time.monotonic() + self.config["minimum_interval"]
+                cache_time = now + self.config["minimum_interval"]
+            # modules that can not be seen do not need updating so often
+            if self.hidden:
+                if self.hidden_pause:
+                    self._py3_wrapper.clear_timeout_due(runner)
+                    continue
+                if self.hidden_interval:
+                    cache_time = max(cache_time, now + self.hidden_interval)
+            self._py3_wrapper.timeout_queue_add(runner, cache_time, lane=lane)
 
-            self._py3_wrapper.timeout_queue_add(self, cache_time)
+    @profile
+    def run(self, meth=None):
+        """
+        On a timely fashion, execute every method found for this module, or
+        just meth if given, that is due.
+        We will respect and set a cache timeout for each method if the user
+        didn't already do so.
+        We will execute the 'kill' method of the module when we terminate.
+        """
+        if not self._py3_wrapper.running:
+            return
+        if not self.loaded:
+            self.load_lazy()
+            return
+        start_cpu_time = time.thread_time()
+        start_time, methods = self._start_run(meth)
+        failed = {}
+        # execute each method of this module
+        for name, my_method in methods:
+            # always check py3status is running
+            if not self._py3_wrapper.running:
+                break
+            try:
+                # execute method and get its output
+                response = self._call_method(name, my_method)
+                if inspect.iscoroutine(response):
+                    # async method, wait for it on the shared loop
+                    response = self._py3_wrapper.async_loop.run(response)
+                self._process_response(name, my_method, response)
+                failed[name] = False
+            except Exception as e:
+                my_method["cached_until"], failed[name] = self._method_failed(name, e)
+
+        self.stats.record("cpu_time", time.thread_time() - start_cpu_time)
+        self._end_run(start_time, [meth] if meth else [x[0] for x in methods], failed)
+
+    async def run_async(self, meth=None):
+        """
+        Like run() but for async methods.  This is run on the shared
+        asyncio loop and awaits the methods so the loop is free to run other
+        modules while this one waits on I/O.  Normal methods, and runs of the
+        whole module, are run by run() in a worker so that they can not hold
+        up the loop.
+        """
+        if not self._py3_wrapper.running:
+            return
+        start_time, methods = self._start_run(meth)
+        failed = {}
+        for name, my_method in methods:
+            if not self._py3_wrapper.running:
+                break
+            try:
+                response = self._call_method(name, my_method)
+                if my_method["is_async"]:
+                    response = await response
+                self._process_response(name, my_method, response)
+                failed[name] = False
+            except Exception as e:
+                my_method["cached_until"], failed[name] = self._method_failed(name, e)
+
+        self._end_run(start_time, [meth] if meth else [x[0] for x in methods], failed)
 
     def kill(self):
+        if self.process:
+            # the worker process runs the 'kill' method
+            self.process.kill()
+            return
         # check and execute the 'kill' method if present
         if self.has_kill:
             try:
@@ -0,0 +1,295 @@
+import asyncio
+import inspect
+import multiprocessing
+import os
+import sys
+from itertools import count
+from queue import Empty, Queue
+from signal import SIG_DFL, SIG_IGN, SIGINT, SIGTERM, SIGUSR1, signal
+from threading import Lock, Thread
+from traceback import format_exc
+
+from py3status.exceptions import Py3Exception
+from py3status.py3 import ModuleErrorException
+
+# the child is forked so that it gets a copy of the module as configured and
+# set up by its post_config_hook().  Other threads may hold locks when we fork
+# so a child can hang, which is why replies are waited for with a timeout.
+CONTEXT = multiprocessing.get_context("fork")
+
+# Py3 methods that are run in the py3status process when called by the module
+# in its worker process
+PROXIED_METHODS = [
+    "get_output",
+    "notify_user",
+    "storage_del",
+    "storage_get",
+    "storage_keys",
+    "storage_set",
+    "trigger_event",
+    "update",
+]
+
+# only one worker process can be started at a time so that a new child does
+# not inherit the child end of another child's pipe
+START_LOCK = Lock()
+
+
+class ModuleProcessError(Exception):
+    """
+    A module method failed in the worker process or the process died.
+    """
+
+
+class ModuleProcess:
+    """
+    Run the methods of a module in a worker process of its own so that a
+    module that is CPU heavy or crashes can not stall or bring down the bar.
+
+    The process is started when the module is first run and restarted if it
+    dies.  The module's responses are sent back to be processed as normal and
+    Py3 methods that need the py3status process eg storage_get() are sent
+    back to be run here.
+    """
+
+    def __init__(self, module):
+        self.call_lock = Lock()
+        self.conn = None
+        self.module = module
+        self.process = None
+        self.replies = Queue()
+        self.send_lock = Lock()
+
+    def start(self):
+        with START_LOCK:
+            conn, child_conn = CONTEXT.Pipe()
+            process = CONTEXT.Process(
+                target=child_main,
+                args=(self.module, child_conn, conn),
+                name=f"py3status-{self.module.module_full_name}",
+                daemon=True,
+            )
+            # multiprocessing closes sys.stdin in the child, if the events
+            # thread was reading from it when we forked the child would wait
+            # forever on the lock that thread held so hide it for the fork.
+            # The events thread keeps its own reference to stdin.
+            stdin, sys.stdin = sys.stdin, None
+            try:
+                process.start()
+            finally:
+                sys.stdin = stdin
+            child_conn.close()
+        self.conn = conn
+        self.process = process
+        Thread(target=self.reader, args=(conn, process), daemon=True).start()
+        self.module._logger.debug("worker process %s started", process.pid)
+
+    def reader(self, conn, process):
+        """
+        Read messages from the worker process.  Replies to calls are passed to
+        the caller and Py3 methods the module calls are run.
+        """
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "call":
+                _, call_id, name, args, kw = message
+                try:
+                    reply = ("reply", call_id, True, self.call_py3(name, args, kw))
+                except Exception as e:
+                    reply = ("reply", call_id, False, str(e) or e.__class__.__name__)
+                try:
+                    with self.send_lock:
+                        conn.send(reply)
+                except (EOFError, OSError):
+                    break
+            else:
+                self.replies.put(message)
+        process.join(1)
+        self.replies.put(("died", process.exitcode))
+
+    def call_py3(self, name, args, kw):
+        return getattr(self.module.module_class.py3, name)(*args, **kw)
+
+    def call(self, *command):
+        """
+        Send the command to the worker process and return its result.
+        """
+        with self.call_lock:
+            if self.process is not None and not self.process.is_alive():
+                # it died since it was last used
+                self.died(self.replies.get())
+            if self.process is None:
+                self.start()
+            try:
+                with self.send_lock:
+                    self.conn.send(command)
+            except (EOFError, OSError):
+                pass
+            reply = self.get_reply()
+            if reply[0] == "died":
+                raise ModuleProcessError(self.died(reply))
+        if reply[0] == "error":
+            raise ModuleErrorException(reply[1], reply[2])
+        if reply[0] == "exception":
+            self.module._logger.debug("worker process %s", reply[2])
+            raise ModuleProcessError(reply[1])
+        return reply[1]
+
+    def get_reply(self):
+        """
+        Wait for the reply to a command.  A worker process that has not
+        replied within the module's run_deadline is killed, so that it is
+        restarted, as it may never reply.
+        """
+        timeout = self.module.run_deadline or None
+        try:
+            return self.replies.get(timeout=timeout)
+        except Empty:
+            self.module._logger.warning(
+                "worker process %s did not reply in %ss, killing it",
+                self.process.pid,
+                timeout,
+            )
+            self.process.kill()
+            return self.replies.get()
+
+    def died(self, reply):
+        """
+        The worker process has died, it will be restarted when next needed.
+        """
+        # wait for the reader to finish with the process
+        while reply[0] != "died":
+            reply = self.replies.get()
+        self.process = None
+        self.conn.close()
+        self.module.stats.count("process_restarts")
+        msg = f"worker process died (exit code {reply[1]})"
+        self.module._logger.warning("%s, restarting", msg)
+        return msg
+
+    def kill(self):
+        """
+        Run the module's kill() method and stop the worker process.
+        """
+        with self.call_lock:
+            if self.process is None:
+                return
+            try:
+                with self.send_lock:
+                    self.conn.send(("kill",))
+            except (EOFError, OSError):
+                pass
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+
+
+def child_main(module, conn, parent_conn):
+    """
+    The worker process, run the commands sent to us.
+    """
+    parent_conn.close()
+    # stdout is the bar, make sure nothing we inherited gets flushed to it
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    # signals are for py3status itself
+    signal(SIGINT, SIG_IGN)
+    signal(SIGTERM, SIG_DFL)
+    signal(SIGUSR1, SIG_IGN)
+    ChildProcess(module, conn).run()
+
+
+class ChildProcess:
+    """
+    The module side of a ModuleProcess.
+    """
+
+    def __init__(self, module, conn):
+        self.call_ids = count()
+        self.commands = Queue()
+        self.conn = conn
+        self.module = module
+        self.replies = {}
+        self.send_lock = Lock()
+
+        # we are the process
+        module.process = None
+        py3 = module.module_class.py3
+        for name in PROXIED_METHODS:
+            setattr(py3, name, self.proxy(name))
+
+    def proxy(self, name):
+        def call_parent(*args, **kw):
+            call_id = next(self.call_ids)
+            reply = self.replies[call_id] = Queue()
+            with self.send_lock:
+                self.conn.send(("call", call_id, name, args, kw))
+            ok, value = reply.get()
+            del self.replies[call_id]
+            if not ok:
+                raise Py3Exception(value)
+            return value
+
+        return call_parent
+
+    def reader(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                # py3status has gone
+                self.commands.put(("kill",))
+                return
+            if message[0] == "reply":
+                _, call_id, ok, value = message
+                self.replies[call_id].put((ok, value))
+            else:
+                self.commands.put(message)
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def run(self):
+        Thread(target=self.reader, daemon=True).start()
+        while True:
+            command = self.commands.get()
+            if command[0] == "kill":
+                self.module.kill()
+                return
+            try:
+                if command[0] == "run":
+                    result = self.run_method(command[1])
+                else:
+                    result = self.click(command[1])
+                self.send(("result", result))
+            except ModuleErrorException as e:
+                self.send(("error", e.msg, e.timeout))
+            except Exception as e:
+                self.send(("exception", str(e) or e.__class__.__name__, format_exc()))
+
+    def run_method(self, meth):
+        response = self.module._call_method(meth, self.module.methods[meth])
+        if inspect.iscoroutine(response):
+            response = asyncio.run(response)
+        return response
+
+    def click(self, event):
+        module = self.module
+        module.prevent_refresh = False
+        click_method = module.module_class.on_click
+        if module.click_events == module.PARAMS_NEW:
+            result = click_method(event)
+        else:
+            result = click_method(
+                module.i3status_thread.json_list,
+                module.config["py3_config"]["general"],
+                event,
+            )
+        if inspect.iscoroutine(result):
+            asyncio.run(result)
+        return module.prevent_refresh
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import time
 from ast import literal_eval
@@ -6,6 +7,7 @@ from threading import Event
 
 from py3status.core import Common, Module
 from py3status.log import ShortnameFilter, log_message, resolve_log_level
+from py3status.profiling import StartupProfile
 
 
 class ExcludeModuleFilter(logging.Filter):
@@ -61,6 +63,7 @@ class MockPy3statusWrapper:
         self.lock = Event()
         self.output_modules = {}
         self.running = True
+        self.startup_profile = StartupProfile()
 
         self.lock.set()
 
@@ -141,7 +144,10 @@ def module_test(module_class, config=None):
         try:
             for my_method in m.methods.values():
                 my_method["cached_until"] = time.monotonic()
-            m.run()
+            if m.has_async:
+                asyncio.run(m.run_async())
+            else:
+                m.run()
             output = m.get_latest()
             for item in output:
                 if "instance" in item:
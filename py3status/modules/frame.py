@@ -105,10 +105,16 @@ class Py3status:
         self.urgent = False
         if not self.py3.format_contains(self.format, "button"):
             self.open = True
+        # the shown modules, none if the frame is closed
+        self.content = set(self.items) if self.open else set()
+        self.py3.register_content(self.content)
         self.py3.register_function("urgent_function", self._urgent_function)
 
     def _urgent_function(self, module_list):
         self.urgent = True
+        # a closed frame shows none of its content so is not updated with it
+        if not self.open:
+            self.py3.update()
 
     def frame(self):
         if not self.items:
@@ -175,6 +181,10 @@ class Py3status:
             if event.get("index") == "button" and self.py3.is_my_event(event):
                 self.urgent = False
                 self.open = not self.open
+                if self.open:
+                    self.content.update(self.items)
+                else:
+                    self.content.clear()
 
 
 if __name__ == "__main__":
@@ -134,18 +134,27 @@ class Py3status:
         # if no button then force open
         if not self.py3.format_contains(self.format, "button"):
             self.open = True
-        self.py3.register_function("content_function", self._content_function)
+        self.content = set()
+        self._update_content()
+        self.py3.register_content(self.content)
         self.py3.register_function("urgent_function", self._urgent_function)
 
-    def _content_function(self):
+    def _update_content(self):
         """
-        This returns a set containing the actively shown module.
-        This is so we only get update events triggered for these modules.
+        Keep the registered content, a set containing the actively shown
+        module, up to date.  This is so we only get update events triggered
+        for this module.
         """
         # ensure that active is valid
         self.active = self.active % len(self.items)
 
-        return {self.items[self.active]}
+        active = self.items[self.active]
+        if active not in self.content:
+            # the core reads the set from other threads so it must never be
+            # seen empty, add the new module before removing the old one.
+            old = list(self.content)
+            self.content.add(active)
+            self.content.difference_update(old)
 
     def _urgent_function(self, module_list):
         """
@@ -156,6 +165,7 @@ class Py3status:
             if module in self.items:
                 self.active = self.items.index(module)
                 self.urgent = True
+        self._update_content()
 
     def _get_output(self):
         if not self.fixed_width:
@@ -193,6 +203,7 @@ class Py3status:
         if not self._get_output() and self.last_active != self.active:
             self._change_active(delta)
         self.last_active = self.active
+        self._update_content()
 
     def _get_output_and_time(self):
         # get an output. again if empty (twice).
@@ -209,6 +220,7 @@ class Py3status:
         return output, update_time
 
     def group(self):
+        self._update_content()
         output, update_time = self._get_output_and_time()
 
         # check for urgents
@@ -1,5 +1,6 @@
 import sys
-from json import dumps
+
+from py3status import codec
 
 
 class OutputFormat:
@@ -71,7 +72,7 @@ class I3barOutputFormat(OutputFormat):
         Produce a line of output from a list of module outputs for
         consumption by i3bar. separator is ignored.
         """
-        return ",".join(dumps(x) for x in outputs)
+        return ",".join(map(codec.dumps, outputs))
 
     def write_header(self, header):
         """
@@ -80,7 +81,7 @@ class I3barOutputFormat(OutputFormat):
         write = sys.__stdout__.write
         flush = sys.__stdout__.flush
 
-        write(dumps(header))
+        write(codec.dumps(header))
         write("\n[[]\n")
         flush()
 
@@ -380,7 +380,11 @@ class ConfigParser:
         run command in the shell
         """
         try:
-            value = check_output(param, shell=True).rstrip()
+            if self.py3_wrapper:
+                with self.py3_wrapper.startup_profile.stage("config shell() calls"):
+                    value = check_output(param, shell=True).rstrip()
+            else:
+                value = check_output(param, shell=True).rstrip()
         except CalledProcessError:
             # for value_type of 'bool' we return False on error code
             if value_type == "bool":
@@ -1,4 +1,8 @@
 import cProfile
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock
 
 # Used in development
 enable_profiling = False
@@ -18,3 +22,132 @@ def profile(thread_run_fn):
             profiler.dump_stats(f"py3status-{thread_id}.profile")
 
     return wrapper_run
+
+
+def process_age():
+    """
+    Return how many seconds ago this process was started or None if this can
+    not be found out.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            stat = f.read()
+        # the process name can contain spaces so skip past it
+        start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+        uptime = time.clock_gettime(time.CLOCK_BOOTTIME)
+        return max(0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (AttributeError, IndexError, OSError, ValueError):
+        return None
+
+
+class StartupProfile:
+    """
+    Record how long the stages of starting py3status take, from the process
+    being started until the bar is first written to and the modules have
+    started, so that slow config functions, imports and modules can be
+    found.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.start = time.perf_counter()
+        # python starting up and importing py3status before we were created
+        self.interpreter = process_age()
+        if self.interpreter is not None:
+            self.start -= self.interpreter
+        self.milestones = {}
+        self.modules = {}
+        self.pending = set()
+        self.reported = False
+        self.stages = {}
+
+    def now(self):
+        """
+        Return the time since the process started.
+        """
+        return time.perf_counter() - self.start
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the code run in the with block.  A stage can be run more than
+        once eg for each shell() in the config, the times are added up.
+        """
+        # stages are reported in the order they started
+        with self.lock:
+            stage = self.stages.setdefault(name, {"count": 0, "time": 0})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                stage["count"] += 1
+                stage["time"] += time.perf_counter() - start
+
+    def add_module(self, module_name, name, duration):
+        """
+        Record the time a module took to do something eg import.
+        """
+        with self.lock:
+            self.modules.setdefault(module_name, {})[name] = duration
+
+    def module_started(self, module_name):
+        with self.lock:
+            if module_name in self.pending:
+                self.pending.discard(module_name)
+                if not self.pending:
+                    self.milestones.setdefault("modules started", self.now())
+
+    def milestone(self, name):
+        """
+        Record the time since the process started that something first
+        happened.
+        """
+        with self.lock:
+            self.milestones.setdefault(name, self.now())
+
+    def report(self):
+        """
+        Return the report as a dict.
+        """
+        with self.lock:
+            return {
+                "interpreter": self.interpreter,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "modules": {name: dict(times) for name, times in self.modules.items()},
+                "milestones": dict(self.milestones),
+                "pending": sorted(self.pending),
+            }
+
+
+def format_startup_profile(report):
+    """
+    Return the startup profile report as text.
+    """
+    lines = ["py3status startup profile"]
+    if report["interpreter"] is not None:
+        lines.append(f"  {'python start and imports':<40}{report['interpreter']:>9.3f}s")
+    for name, stage in report["stages"].items():
+        count = f" x{stage['count']}" if stage["count"] > 1 else ""
+        lines.append(f"  {name + count:<40}{stage['time']:>9.3f}s")
+    if report["modules"]:
+        lines.append(f"  {'module':<40}{'import':>10}{'post_config_hook':>18}")
+        modules = sorted(
+            report["modules"].items(),
+            key=lambda item: sum(item[1].values()),
+            reverse=True,
+        )
+        for name, times in modules:
+            import_time = times.get("import")
+            hook_time = times.get("post_config_hook")
+            lines.append(
+                f"    {name:<38}"
+                f"{'-' if import_time is None else f'{import_time:.3f}s':>10}"
+                f"{'-' if hook_time is None else f'{hook_time:.3f}s':>18}"
+            )
+    for name in report["pending"]:
+        lines.append(f"    {name:<38}{'still starting':>28}")
+    lines.append("  since the process started")
+    for name, offset in sorted(report["milestones"].items(), key=lambda item: item[1]):
+        lines.append(f"  {name:<40}{offset:>9.3f}s")
+    return "\n".join(lines)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import re
@@ -100,9 +101,6 @@ class Py3:
         self._english_env = dict(os.environ)
         self._english_env["LC_ALL"] = "C"
         self._english_env["LANGUAGE"] = "C"
-        self._format_color_names = {}
-        self._format_placeholders = {}
-        self._format_placeholders_cache = {}
         self._logger = None
         self._module = module
         self._replacements = None
@@ -118,9 +116,12 @@ class Py3:
             self._py3status_module = module.module_class
             self._py3_wrapper = module._py3_wrapper
             # create formatter we only if need one but want to pass py3_wrapper so
-            # that we can do logging etc.
-            if not self._formatter:
-                self.__class__._formatter = Formatter(module._py3_wrapper)
+            # that we can do logging etc.  The format cache it uses is shared
+            # by all modules.
+            self._formatter = Formatter(module._py3_wrapper, stats=module.stats)
+        else:
+            self._formatter = Formatter()
+            self._py3status_module = None
 
     def __getattr__(self, name):
         """
@@ -541,6 +542,23 @@ class Py3:
                 icon=icon,
             )
 
+    def register_content(self, content):
+        """
+        Register the set of module names that a container is displaying.  This
+        is used, like ``content_function()``, to determine when updates need
+        passing on to the container and which modules can not be seen but
+        without a new set being made for every update.
+
+        The container must keep this same set up to date, changing it in
+        place, when what it displays changes.
+
+        .. note::
+
+            This function should only be used by containers.
+        """
+        my_info = self._get_module_info(self._module.module_full_name)
+        my_info["content"] = content
+
     def register_function(self, function_name, function):
         """
         Register a function for the module.
@@ -664,26 +682,19 @@ class Py3:
         else:
             key = names
             names = [names]
+        contains = self._formatter.parse(format_string).contains
         try:
-            return self._format_placeholders_cache[format_string][key]
+            return contains[key]
         except KeyError:
             pass
 
-        if format_string not in self._format_placeholders:
-            placeholders = self._formatter.get_placeholders(format_string)
-            self._format_placeholders[format_string] = placeholders
-        else:
-            placeholders = self._format_placeholders[format_string]
-
-        if format_string not in self._format_placeholders_cache:
-            self._format_placeholders_cache[format_string] = {}
-
+        placeholders = self._formatter.get_placeholders(format_string)
         for name in names:
             for placeholder in placeholders:
                 if fnmatch(placeholder, name):
-                    self._format_placeholders_cache[format_string][key] = True
+                    contains[key] = True
                     return True
-        self._format_placeholders_cache[format_string][key] = False
+        contains[key] = False
         return False
 
     def get_color_names_list(self, format_string, matches=None):
@@ -708,11 +719,7 @@ class Py3:
         elif not format_string:
             return []
 
-        if format_string not in self._format_color_names:
-            names = self._formatter.get_color_names(format_string)
-            self._format_color_names[format_string] = names
-        else:
-            names = self._format_color_names[format_string]
+        names = self._formatter.get_color_names(format_string)
 
         if not matches:
             return list(names)
@@ -734,11 +741,7 @@ class Py3:
         if not replacements or not format_string:
             return []
 
-        if format_string not in self._format_placeholders:
-            placeholders = self._formatter.get_placeholders(format_string)
-            self._format_placeholders[format_string] = placeholders
-        else:
-            placeholders = self._format_placeholders[format_string]
+        placeholders = self._formatter.get_placeholders(format_string)
 
         # filter placeholders
         found = set()
@@ -767,11 +770,7 @@ class Py3:
         formatting that may be applied to them
         eg ``'{placeholder:.2f}'`` will give ``['{placeholder}']``
         """
-        if format_string not in self._format_placeholders:
-            placeholders = self._formatter.get_placeholders(format_string)
-            self._format_placeholders[format_string] = placeholders
-        else:
-            placeholders = self._format_placeholders[format_string]
+        placeholders = self._formatter.get_placeholders(format_string)
 
         if not matches:
             return list(placeholders)
@@ -870,6 +869,10 @@ class Py3:
         max_width lets you to control the total max width of 'full_text' the
         module is allowed to output on the bar.
         """
+        # the module can be set to reuse the output while its values are unchanged
+        memo_key = None
+        if self._module and self._module.memoize_format:
+            memo_key = self._uid
         try:
             result = self._formatter.format(
                 format_string,
@@ -877,6 +880,7 @@ class Py3:
                 param_dict,
                 force_composite=force_composite,
                 attr_getter=attr_getter,
+                memo_key=memo_key,
             )
             if max_width is not None and max_width > 0:
                 if isinstance(result, str):
@@ -1048,7 +1052,61 @@ class Py3:
             raise exceptions.CommandError(msg, error_code=e.errno)
 
         output, error = process.communicate()
-        retcode = process.poll()
+        self._command_output_check(pretty_cmd, process.poll(), output, error)
+        return output
+
+    async def command_output_async(
+        self, command, shell=False, capture_stderr=False, localized=False
+    ):
+        """
+        Async version of `command_output()` for use in `async def` module
+        methods.  The command is run without blocking the event loop so
+        other modules can run while waiting for it.
+
+        :param command: command to run can be a str or list
+        :param shell: if `True` then command is run through the shell
+        :param capture_stderr: if `True` then STDERR is piped to STDOUT
+        :param localized: if `False` then command is forced to use its default (English) locale
+
+        A CommandError is raised if an error occurs
+        """
+        if isinstance(command, str):
+            pretty_cmd = command
+        else:
+            pretty_cmd = " ".join(command)
+
+        stderr = STDOUT if capture_stderr else PIPE
+        env = self._english_env if not localized else None
+
+        try:
+            if shell:
+                if not isinstance(command, str):
+                    command = " ".join(shlex.quote(x) for x in command)
+                process = await asyncio.create_subprocess_shell(
+                    command, stdout=PIPE, stderr=stderr, env=env
+                )
+            else:
+                if isinstance(command, str):
+                    command = shlex.split(command)
+                process = await asyncio.create_subprocess_exec(
+                    *command, stdout=PIPE, stderr=stderr, env=env
+                )
+        except Exception as e:
+            msg = f"Command `{pretty_cmd}` {e}"
+            self.log(msg)
+            raise exceptions.CommandError(msg, error_code=getattr(e, "errno", None))
+
+        output, error = await process.communicate()
+        output = output.decode()
+        if error is not None:
+            error = error.decode()
+        self._command_output_check(pretty_cmd, process.returncode, output, error)
+        return output
+
+    def _command_output_check(self, pretty_cmd, retcode, output, error):
+        """
+        Raise a CommandError if the command did not succeed.
+        """
         if retcode:
             # under certain conditions a successfully run command may get a
             # return code of -15 even though correct output was returned see
@@ -1064,7 +1122,6 @@ class Py3:
                     msg += " ({output})"
                 msg = msg.format(cmd=pretty_cmd, error=retcode, output=output_oneline)
                 raise exceptions.CommandError(msg, error_code=retcode, error=error, output=output)
-        return output
 
     def _storage_init(self):
         """
@@ -1334,3 +1391,13 @@ class Py3:
         self.log(f"HTTP request retry {retry_times}/{retry_times}")
         sleep(retry_wait)
         return get_http_response()
+
+    async def request_async(self, url, **kw):
+        """
+        Async version of `request()` for use in `async def` module methods.
+        It takes the same parameters and returns an HttpResponse.
+
+        The request itself is made in a helper thread so that the event loop
+        is free to run other modules while waiting for the response.
+        """
+        return await asyncio.to_thread(self.request, url, **kw)
@@ -0,0 +1,299 @@
+import asyncio
+from collections import deque
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Condition, Lock, Thread, get_ident
+from time import monotonic
+
+# marker for heap entries that have been rescheduled or removed
+REMOVED = object()
+
+# default number of threads in the WorkerPool
+WORKERS_DEFAULT = 16
+
+# only compact the heap once this many removed entries have built up
+COMPACT_MIN_REMOVED = 64
+
+# priority lanes, work in a lower numbered lane is always run first.
+# interactive: click events and refreshes asked for by the user
+# urgent: updates asked for by modules, signals etc
+# background: the regular timed updates of modules
+LANE_INTERACTIVE = 0
+LANE_URGENT = 1
+LANE_BACKGROUND = 2
+LANES = 3
+
+# extra threads the WorkerPool may start beyond max_workers so that
+# interactive work does not wait for background work to finish
+INTERACTIVE_RESERVE = 2
+
+
+class TimeoutQueue:
+    """
+    A priority queue of items (modules, tasks) that are due to run at a given
+    time.
+
+    Entries are kept in a heap ordered by due time so adding an item or
+    finding the next one due is O(log n).  When an item is rescheduled or
+    removed its old entry is not searched for, it is just marked as removed
+    and thrown away when it reaches the top of the heap (lazy deletion).
+    """
+
+    def __init__(self):
+        self.counter = count()
+        self.entries = {}
+        self.heap = []
+        self.removed = 0
+        # the times items are due, bucketed by second, to allow timer slack
+        self.wakeups = {}
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, item):
+        """
+        Return when the item is due or None if it is not queued.
+        """
+        entry = self.entries.get(item)
+        if entry is not None:
+            return entry[0]
+
+    def add(self, item, due):
+        """
+        Queue the item to be due at the given time.  If the item is already
+        queued it is rescheduled.
+        """
+        self.remove(item)
+        # the counter keeps items due at the same time in the order they were
+        # added and means that items themselves never get compared.
+        entry = [due, next(self.counter), item]
+        self.entries[item] = entry
+        heappush(self.heap, entry)
+        bucket = self.wakeups.setdefault(int(due), {})
+        bucket[due] = bucket.get(due, 0) + 1
+
+    def _remove_wakeup(self, due):
+        bucket = self.wakeups[int(due)]
+        if bucket[due] == 1:
+            del bucket[due]
+            if not bucket:
+                del self.wakeups[int(due)]
+        else:
+            bucket[due] -= 1
+
+    def find_wakeup(self, start, end):
+        """
+        Return the earliest time between start and end that an item is already
+        due or None if there is not one.
+        """
+        found = None
+        for second in range(int(start), int(end) + 1):
+            for due in self.wakeups.get(second, ()):
+                if start <= due <= end and (found is None or due < found):
+                    found = due
+        return found
+
+    def remove(self, item):
+        """
+        Remove the item from the queue if it is queued.
+        """
+        entry = self.entries.pop(item, None)
+        if entry is None:
+            return
+        self._remove_wakeup(entry[0])
+        entry[-1] = REMOVED
+        self.removed += 1
+        # do not let the heap fill up with dead entries
+        if self.removed > COMPACT_MIN_REMOVED and self.removed > len(self.heap) // 2:
+            self.heap = [x for x in self.heap if x[-1] is not REMOVED]
+            heapify(self.heap)
+            self.removed = 0
+
+    def next_due(self):
+        """
+        Return the time that the next item is due or None if the queue is
+        empty.
+        """
+        heap = self.heap
+        while heap and heap[0][-1] is REMOVED:
+            heappop(heap)
+            self.removed -= 1
+        if heap:
+            return heap[0][0]
+
+    def pop_due(self, now):
+        """
+        Remove and return a list of all items due at or before now, earliest
+        first.
+        """
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            due_time, _, item = heappop(heap)
+            if item is REMOVED:
+                self.removed -= 1
+                continue
+            del self.entries[item]
+            self._remove_wakeup(due_time)
+            due.append(item)
+        return due
+
+
+class WorkerPool:
+    """
+    A bounded pool of reusable threads that run modules and tasks so that
+    we do not need to start a new thread every time something runs.
+
+    Threads are only started when there is work and no idle thread to do it
+    and up to max_workers of them.  After that work waits for a free thread,
+    free threads take work from the highest priority lane first.
+
+    So that interactive work never waits behind background work there are
+    also a few reserve threads that only run interactive work.
+    """
+
+    def __init__(self, py3_wrapper, max_workers=WORKERS_DEFAULT):
+        # name: (thread ident, start time) of what is running
+        self.active = {}
+        lock = Lock()
+        self.condition = Condition(lock)
+        self.idle = 0
+        self.max_workers = max_workers
+        self.py3_wrapper = py3_wrapper
+        self.reserve_condition = Condition(lock)
+        self.reserve_idle = 0
+        self.reserve_threads = []
+        self.running = True
+        self.threads = []
+        self.work = [deque() for _ in range(LANES)]
+
+    def _start_thread(self, reserve):
+        threads = self.reserve_threads if reserve else self.threads
+        name = f"py3status-{'reserve' if reserve else 'worker'}-{len(threads)}"
+        thread = Thread(target=self.worker, args=(reserve,), name=name, daemon=True)
+        threads.append(thread)
+        thread.start()
+
+    def submit(self, item, name, lane=LANE_BACKGROUND):
+        """
+        Run the item.  Once it has finished running its name is added to
+        timeout_finished so that the core knows it is no longer running.
+        """
+        with self.condition:
+            self.work[lane].append((item, name))
+            if self.idle:
+                self.idle -= 1
+                self.condition.notify()
+            elif len(self.threads) < self.max_workers:
+                self._start_thread(reserve=False)
+            elif lane == LANE_INTERACTIVE:
+                if self.reserve_idle:
+                    self.reserve_idle -= 1
+                    self.reserve_condition.notify()
+                elif len(self.reserve_threads) < INTERACTIVE_RESERVE:
+                    self._start_thread(reserve=True)
+
+    def stop(self):
+        """
+        Stop all the workers once they have finished their current work.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+            self.reserve_condition.notify_all()
+
+    def worker(self, reserve=False):
+        if reserve:
+            condition = self.reserve_condition
+            lanes = self.work[: LANE_INTERACTIVE + 1]
+        else:
+            condition = self.condition
+            lanes = self.work
+        while True:
+            with condition:
+                while self.running and not any(lanes):
+                    if reserve:
+                        self.reserve_idle += 1
+                    else:
+                        self.idle += 1
+                    condition.wait()
+                if not self.running:
+                    return
+                for work in lanes:
+                    if work:
+                        item, name = work.popleft()
+                        break
+            if name:
+                self.active[name] = (get_ident(), monotonic())
+            try:
+                item.run()
+            except:  # noqa e722
+                self.py3_wrapper.report_exception("Runner")
+            if name:
+                self.active.pop(name, None)
+            # the module is no longer running so notify the timeout logic
+            if name:
+                self.py3_wrapper.timeout_finished.append(name)
+
+
+class AsyncLoop:
+    """
+    A single asyncio event loop, run in its own thread, shared by all modules
+    with async methods.  A module waiting on I/O in an async method does not
+    need a thread of its own so many of them can run at the same time.
+
+    The loop is only started when something first needs it.
+    """
+
+    def __init__(self, py3_wrapper):
+        # name: (thread ident, start time) of what is running
+        self.active = {}
+        self.lock = Lock()
+        self.loop = None
+        self.py3_wrapper = py3_wrapper
+        self.thread = None
+
+    def _get_loop(self):
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                self.thread = Thread(target=loop.run_forever, name="py3status-asyncio", daemon=True)
+                self.thread.start()
+                self.loop = loop
+            return self.loop
+
+    def run(self, coro):
+        """
+        Run the coroutine on the loop, wait for it to finish and return its
+        result.  This must not be called from the loop thread itself.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def submit(self, item, name):
+        """
+        Run the item's run_async() coroutine.  Once it has finished its name is
+        added to timeout_finished so that the core knows it is no longer
+        running.
+        """
+        asyncio.run_coroutine_threadsafe(self._run(item, name), self._get_loop())
+
+    async def _run(self, item, name):
+        self.active[name] = (self.thread.ident, monotonic())
+        try:
+            await item.run_async()
+        except:  # noqa e722
+            self.py3_wrapper.report_exception("Runner")
+        self.active.pop(name, None)
+        # the module is no longer running so notify the timeout logic
+        self.py3_wrapper.timeout_finished.append(name)
+
+    def stop(self):
+        """
+        Stop the loop, anything still running on it is abandoned.
+        """
+        with self.lock:
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.loop.stop)
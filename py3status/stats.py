@@ -0,0 +1,69 @@
+from bisect import bisect_left
+from collections import Counter
+
+# upper bounds, in seconds, of the histogram buckets
+HISTOGRAM_BOUNDS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+
+class Histogram:
+    """
+    A histogram of timings with fixed buckets so that recording a value is
+    cheap and the memory used does not grow.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.max = 0
+        self.total = 0
+
+    def add(self, value):
+        self.buckets[bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def as_dict(self):
+        buckets = {}
+        for bound, count in zip(HISTOGRAM_BOUNDS, self.buckets):
+            if count:
+                buckets[f"<={bound}"] = count
+        if self.buckets[-1]:
+            buckets[f">{HISTOGRAM_BOUNDS[-1]}"] = self.buckets[-1]
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+class ModuleStats:
+    """
+    Always on runtime statistics for a module.
+
+    counters are simple counts eg the number of runs.  histograms record
+    timings in seconds eg how long a run took.
+    """
+
+    def __init__(self):
+        self.counters = Counter()
+        self.histograms = {}
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def record(self, name, value):
+        try:
+            self.histograms[name].add(value)
+        except KeyError:
+            histogram = self.histograms[name] = Histogram()
+            histogram.add(value)
+
+    def as_dict(self):
+        stats = dict(self.counters)
+        # worker threads can add histograms while we are reading them
+        for name, histogram in list(self.histograms.items()):
+            stats[name] = histogram.as_dict()
+        return stats
@@ -1,7 +1,7 @@
 import logging
 from collections import Counter, defaultdict
 from datetime import datetime
-from time import sleep
+from threading import Lock
 
 from py3status.constants import ON_TRIGGER_ACTIONS
 
@@ -12,6 +12,9 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# seconds to give a device to settle before modules are refreshed
+REFRESH_DELAY = 0.1
+
 
 class UdevMonitor:
     """
@@ -22,6 +25,7 @@ class UdevMonitor:
         """
         The udev monitoring will be lazy loaded if a module uses it.
         """
+        self.lock = Lock()
         self.py3_wrapper = py3_wrapper
         self.pyudev_available = pyudev is not None
         self.throttle = defaultdict(Counter)
@@ -56,19 +60,21 @@ class UdevMonitor:
         Subscribe the given module to the given udev subsystem.
 
         Here we will lazy load the monitor if necessary and return success or
-        failure based on the availability of pyudev.
+        failure based on the availability of pyudev.  Modules are loaded in
+        parallel so this can be called from several threads at once.
         """
         if self.pyudev_available:
-            # lazy load the udev monitor
-            if self.udev_observer is None:
-                self._setup_pyudev_monitoring()
-            if trigger_action not in ON_TRIGGER_ACTIONS:
-                py3_module._logger.info(
-                    "invalid action '%s' on events subscription",
-                    trigger_action,
-                )
-                return False
-            self.udev_consumers[subsystem].append((py3_module, trigger_action))
+            with self.lock:
+                # lazy load the udev monitor
+                if self.udev_observer is None:
+                    self._setup_pyudev_monitoring()
+                if trigger_action not in ON_TRIGGER_ACTIONS:
+                    py3_module._logger.info(
+                        "invalid action '%s' on events subscription",
+                        trigger_action,
+                    )
+                    return False
+                self.udev_consumers[subsystem].append((py3_module, trigger_action))
             py3_module._logger.info(
                 "subscribed to events on %s",
                 subsystem,
@@ -102,7 +108,6 @@ class UdevMonitor:
                     "event '%s' refreshing consumer",
                     event_key,
                 )
-                sleep(0.1)
-                py3_module.force_update()
+                py3_module.force_update(delay=REFRESH_DELAY)
                 self.throttle[event_key].clear()
                 self.throttle[event_key][resolution] = occurences + 1
@@ -0,0 +1,36 @@
+import pytest
+
+from py3status import codec
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    yield
+    codec.use("json")
+
+
+def test_use_auto():
+    assert codec.use() == codec.available()[0]
+    assert codec.backend == codec.available()[0]
+    assert codec.available()[-1] == "json"
+
+
+@pytest.mark.parametrize("name", codec.available())
+def test_round_trip(name):
+    codec.use(name)
+    data = [{"full_text": "café http://x", "name": "a", "separator": False, "index": 1}]
+    assert codec.loads(codec.dumps(data)) == data
+    assert codec.loads(b'[{"full_text": "b"}]') == [{"full_text": "b"}]
+    assert isinstance(codec.dumps(data), str)
+
+
+def test_use_invalid():
+    with pytest.raises(ValueError, match="Invalid json backend `yaml`"):
+        codec.use("yaml")
+    assert codec.backend == "json"
+
+
+def test_orjson_falls_back():
+    pytest.importorskip("orjson")
+    codec.use("orjson")
+    assert codec.dumps({1: "a"}) == '{"1": "a"}'
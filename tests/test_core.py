@@ -0,0 +1,658 @@
+import os
+import threading
+import time
+from argparse import Namespace
+from signal import SIGTERM, SIGTSTP, SIGUSR1, getsignal, signal
+
+import pytest
+
+from py3status.constants import MAX_NESTING_LEVELS, SNAPSHOT_MAX_AGE, STALE_COLOR
+from py3status.core import Py3statusWrapper
+from py3status.events import EventClickTask, EventTask
+from py3status.module import Module
+from py3status.module_test import MockPy3statusWrapper
+from py3status.modules.frame import Py3status as Frame
+from py3status.output import OutputFormat
+from py3status.parse_config import process_config
+from py3status.scheduler import LANE_BACKGROUND, LANE_INTERACTIVE
+from py3status.stats import ModuleStats
+from py3status.storage import Storage
+
+
+def make_wrapper(py3status_config=None, module_groups=None):
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.config["py3_config"] = {
+        "py3status": py3status_config or {},
+        ".module_groups": module_groups or {},
+        "order": [],
+    }
+    wrapper.build_container_index()
+    return wrapper
+
+
+def test_frame_delay_disabled():
+    wrapper = make_wrapper()
+    wrapper.notify_update("clock")
+    assert wrapper.frame_delay() == 0
+
+
+def test_frame_delay_coalesce_and_rate():
+    wrapper = make_wrapper()
+    wrapper.coalesce_window = 0.05
+    wrapper.notify_update("clock")
+    assert 0 < wrapper.frame_delay() <= 0.05
+
+    # a recent write holds back the next one
+    wrapper.max_refresh_rate = 2
+    wrapper.last_write_ts = time.monotonic()
+    assert 0.05 < wrapper.frame_delay() <= 0.5
+
+
+def test_frame_delay_bypass():
+    wrapper = make_wrapper(module_groups={"clock": ["group"]})
+    wrapper.coalesce_window = 1
+    wrapper.notify_update("clock", urgent=True)
+    assert wrapper.frame_delay() == 0
+
+    wrapper.update_bypass.clear()
+    wrapper.update_queue.clear()
+    wrapper.notify_update("clock")
+    assert wrapper.frame_delay() > 0
+
+    # clicked modules and their containers are not delayed
+    wrapper.update_queue.clear()
+    wrapper.register_click("clock")
+    wrapper.notify_update("group")
+    assert wrapper.frame_delay() == 0
+
+
+def test_check_deadlines():
+    class Hung:
+        def hung(self):
+            return {"full_text": "hung"}
+
+    mock = MockPy3statusWrapper(
+        {"general": {}, "py3status": {}, ".module_groups": {}, "hung": {"run_deadline": 5}}
+    )
+    module = Module("hung", {}, mock, Hung())
+    module.prepare_module()
+    module.run()
+
+    wrapper = make_wrapper()
+    wrapper.modules["hung"] = module
+    wrapper.workers.active["hung"] = (threading.get_ident(), time.monotonic() - 1)
+    wrapper.check_deadlines()
+    assert not module.stale
+
+    wrapper.workers.active["hung"] = (threading.get_ident(), time.monotonic() - 10)
+    wrapper.check_deadlines()
+    assert module.stale
+    assert module.get_latest()[0]["color"] == STALE_COLOR
+
+    # the run returns
+    del wrapper.workers.active["hung"]
+    wrapper.timeout_finished.append("hung")
+    wrapper.timeout_queue_process()
+    assert not module.stale
+    assert "color" not in module.get_latest()[0]
+
+
+def test_click_not_held_by_running_module():
+    wrapper = make_wrapper()
+    wrapper.workers.max_workers = 1
+    started = threading.Event()
+    release = threading.Event()
+    clicked = threading.Event()
+
+    class Slow:
+        module_full_name = "slow"
+
+        def run(self):
+            started.set()
+            release.wait(5)
+
+    class Events:
+        def on_click_dispatcher(self, module_name, event, command):
+            clicked.set()
+
+    wrapper.timeout_queue_add(Slow())
+    wrapper.timeout_queue_process()
+    started.wait(5)
+    # another run of the module queues behind slow but its external
+    # on_click command does not
+    wrapper.timeout_queue_add(Slow())
+    wrapper.timeout_queue_add(EventClickTask("slow", {}, Events(), "true"))
+    wrapper.timeout_queue_process()
+    try:
+        assert clicked.wait(5)
+        assert "slow" in wrapper.timeout_missed
+    finally:
+        release.set()
+        wrapper.workers.stop()
+
+
+def test_click_serialized_with_module():
+    wrapper = make_wrapper()
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    class Events:
+        def process_event(self, module_name, event, default_event):
+            order.append("click")
+
+    class Slow:
+        module_full_name = "slow"
+
+        def run(self):
+            order.append("update")
+            started.set()
+            release.wait(5)
+
+    wrapper.timeout_queue_add(Slow())
+    wrapper.timeout_queue_process()
+    started.wait(5)
+    # the click waits for the module but goes ahead of its next update
+    wrapper.timeout_queue_add(Slow())
+    wrapper.timeout_queue_add(EventTask("slow", {}, False, Events()))
+    wrapper.timeout_queue_process()
+    try:
+        time.sleep(0.1)
+        assert order == ["update"]
+        assert wrapper.timeout_missed["slow"]
+    finally:
+        release.set()
+    deadline = time.monotonic() + 5
+    while len(order) < 3 and time.monotonic() < deadline:
+        wrapper.timeout_queue_process()
+        time.sleep(0.01)
+    wrapper.workers.stop()
+    assert order == ["update", "click", "update"]
+
+
+def test_click_dispatched_while_paced(monkeypatch):
+    monkeypatch.setattr("py3status.core.signal", lambda *args: None)
+    wrapper = make_wrapper()
+    wrapper.create_mappings = lambda config: None
+    wrapper.create_output_modules = lambda: None
+    wrapper.config["click_events"] = True
+    wrapper.output_format = Namespace(write_header=lambda header: None)
+    stop = threading.Event()
+
+    class StopLoop(Exception):
+        pass
+
+    def count_wakeup():
+        if stop.is_set():
+            raise StopLoop
+
+    def run():
+        try:
+            wrapper.run()
+        except StopLoop:
+            pass
+
+    wrapper.count_wakeup = count_wakeup
+    # the pending update is held back for 10 seconds
+    wrapper.max_refresh_rate = 0.1
+    wrapper.last_write_ts = time.monotonic()
+    wrapper.notify_update("clock")
+    loop = threading.Thread(target=run, daemon=True)
+    loop.start()
+
+    clicked = threading.Event()
+
+    class Click:
+        lane = LANE_INTERACTIVE
+
+        def run(self):
+            clicked.set()
+
+    time.sleep(0.05)
+    wrapper.timeout_queue_add(Click())
+    try:
+        assert clicked.wait(1)
+        assert list(wrapper.update_queue) == ["clock"]
+    finally:
+        stop.set()
+        wrapper.update_request.set()
+        loop.join(5)
+        wrapper.workers.stop()
+
+
+def test_startup_profile_report_unchanged_line(monkeypatch):
+    monkeypatch.setattr("py3status.core.signal", lambda *args: None)
+    wrapper = make_wrapper()
+    wrapper.create_mappings = lambda config: None
+    wrapper.create_output_modules = lambda: None
+    wrapper.config["click_events"] = True
+    wrapper.output_format = Namespace(write_header=lambda header: None)
+    reported = threading.Event()
+
+    class StopLoop(Exception):
+        pass
+
+    def count_wakeup():
+        if reported.is_set():
+            raise StopLoop
+
+    def run():
+        try:
+            wrapper.run()
+        except StopLoop:
+            pass
+
+    wrapper.count_wakeup = count_wakeup
+    # the line is the same as the last one written so is not written
+    wrapper.process_update_queue = lambda output: (list(wrapper.update_queue), False)
+    wrapper.startup_profile_report = reported.set
+    wrapper.notify_update("clock")
+    loop = threading.Thread(target=run, daemon=True)
+    loop.start()
+    try:
+        assert reported.wait(1)
+        assert wrapper.writes_suppressed == 1
+    finally:
+        reported.set()
+        wrapper.update_request.set()
+        loop.join(5)
+        wrapper.workers.stop()
+
+
+def test_click_to_render_latency():
+    wrapper = make_wrapper(module_groups={"clock": ["group"]})
+
+    class Stats:
+        def __init__(self):
+            self.lanes = []
+            self.stats = ModuleStats()
+
+        def force_update(self, lane):
+            self.lanes.append(lane)
+
+    for name in ["clock", "group"]:
+        wrapper.output_modules[name] = {"type": "py3status", "module": Stats()}
+    wrapper.register_click("clock")
+    wrapper.notify_update("clock")
+    # the container is updated in the interactive lane
+    assert wrapper.output_modules["group"]["module"].lanes == [LANE_INTERACTIVE]
+    wrapper.last_write_ts = time.monotonic() + 0.1
+    wrapper.record_write_stats(["clock", "group"])
+    for name in ["clock", "group"]:
+        stats = wrapper.output_modules[name]["module"].stats.as_dict()
+        assert stats["click_to_render"]["count"] == 1
+    core = wrapper.get_stats([])["core"]["click_to_render"]
+    assert core["count"] == 1
+    assert 0.1 <= core["max"] < 1
+
+    # only the first write after a click counts
+    wrapper.record_write_stats(["clock"])
+    assert wrapper.click_latency.count == 1
+
+
+def test_update_visibility():
+    class Child:
+        def __init__(self):
+            self.hidden = False
+
+        def set_hidden(self, hidden):
+            self.hidden = hidden
+
+    # group showing one of a frame (of d and e) and c, the frame can close
+    wrapper = make_wrapper(module_groups={"frame": ["group"], "c": ["group"], "d": ["frame"]})
+    py3_config = wrapper.config["py3_config"]
+    py3_config["order"] = ["group", "clock"]
+    py3_config["group"] = {"items": ["frame", "c"]}
+    py3_config["frame"] = {"items": ["d", "e"]}
+    shown = {"group": {"frame"}, "frame": {"d", "e"}}
+    for name in ["group", "frame"]:
+        wrapper.output_modules[name] = {"content_function": lambda name=name: shown[name]}
+    for name in ["clock", "group", "frame", "c", "d", "e"]:
+        wrapper.modules[name] = Child()
+
+    def hidden():
+        return {name for name, module in wrapper.modules.items() if module.hidden}
+
+    wrapper.update_visibility()
+    assert hidden() == {"c"}
+    shown["frame"] = set()
+    wrapper.update_visibility()
+    assert hidden() == {"c", "d", "e"}
+    shown["group"] = {"c"}
+    shown["frame"] = {"d", "e"}
+    wrapper.update_visibility()
+    assert hidden() == {"frame", "d", "e"}
+
+
+def test_process_update_queue_unchanged():
+    class Static:
+        def __init__(self, text):
+            self.text = text
+
+        def get_latest(self):
+            return [{"full_text": self.text}]
+
+    wrapper = make_wrapper()
+    wrapper.config["py3_config"]["general"] = {}
+    wrapper.output_format = OutputFormat.instance_for("i3bar")
+    wrapper.output_modules = {
+        "a": {"module": Static("a"), "position": [0], "color": None},
+        "b": {"module": Static("b"), "position": [1, 2], "color": None},
+    }
+    output = [None] * 3
+    wrapper.update_queue.extend(["a", "b"])
+    assert wrapper.process_update_queue(output) == (["a", "b"], True)
+    assert output == ['{"full_text": "a"}', '{"full_text": "b"}', '{"full_text": "b"}']
+
+    # re-rendered to the same text
+    wrapper.update_queue.extend(["b", "a"])
+    assert wrapper.process_update_queue(output) == (["b", "a"], False)
+
+    wrapper.output_modules["b"]["module"].text = "c"
+    wrapper.update_queue.append("b")
+    assert wrapper.process_update_queue(output) == (["b"], True)
+    assert output[2] == '{"full_text": "c"}'
+
+
+def test_process_module_output_cached():
+    class Composite:
+        def __init__(self, output):
+            self.output = output
+
+        def get_latest(self):
+            return self.output
+
+    wrapper = make_wrapper()
+    wrapper.config["py3_config"]["general"] = {}
+    wrapper.output_format = OutputFormat.instance_for("i3bar")
+    composite = Composite([{"full_text": "a"}, {"full_text": "b"}])
+    module = {"module": composite, "position": [0], "color": "#FF0000"}
+    out = wrapper.process_module_output(module)
+    assert out == '{"full_text": "a", "color": "#FF0000"},{"full_text": "b", "color": "#FF0000"}'
+    assert wrapper.process_module_output(module) is out
+
+    # new output is formatted again
+    composite.output = [{"full_text": "c", "color": "#00FF00"}]
+    assert wrapper.process_module_output(module) == '{"full_text": "c", "color": "#00FF00"}'
+
+
+NESTED_CONFIG = """
+order += "frame a"
+frame a {
+    group b {
+        group c {
+            static_string e {}
+            static_string f {}
+        }
+        static_string h {}
+    }
+    static_string g {}
+}
+"""
+
+
+def make_nested_wrapper(tmp_path):
+    """
+    frame a > group b > group c > static_string e, the deepest nesting allowed
+    """
+
+    class Module:
+        def __init__(self):
+            self.hidden = False
+            self.lanes = []
+
+        def force_update(self, lane):
+            self.lanes.append(lane)
+
+        def set_hidden(self, hidden):
+            self.hidden = hidden
+
+    config_path = tmp_path / "config"
+    config_path.write_text(NESTED_CONFIG)
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.config["py3_config"] = py3_config = process_config(config_path)
+    wrapper.build_container_index()
+    for name in py3_config["py3_modules"]:
+        wrapper.modules[name] = Module()
+        wrapper.output_modules[name] = {"module": wrapper.modules[name]}
+    # what each container shows
+    content = {}
+    for name in ["frame a", "group b", "group c"]:
+        items = py3_config[name]["items"]
+        content[name] = set(items if name == "frame a" else items[:1])
+        wrapper.output_modules[name]["content"] = content[name]
+    return wrapper, content
+
+
+def test_container_index_nested(tmp_path):
+    wrapper, _ = make_nested_wrapper(tmp_path)
+    assert MAX_NESTING_LEVELS == 4
+    assert wrapper.container_ancestors["static_string e"] == ("group c", "group b", "frame a")
+    assert wrapper.container_ancestors["group c"] == ("group b", "frame a")
+    assert wrapper.container_ancestors["static_string g"] == ("frame a",)
+    assert "frame a" not in wrapper.container_ancestors
+    assert wrapper.container_parents["static_string e"] == ("group c",)
+    assert wrapper.container_parents["group c"] == ("group b",)
+    assert wrapper.containers == {"frame a", "group b", "group c"}
+
+    # a click on the innermost module is a click on all its containers
+    wrapper.register_click("static_string e")
+    assert set(wrapper.click_pending) == {"static_string e", "group c", "group b", "frame a"}
+
+
+def test_notify_update_nested(tmp_path):
+    wrapper, content = make_nested_wrapper(tmp_path)
+
+    def updated():
+        names = {name for name, module in wrapper.modules.items() if module.lanes}
+        for module in wrapper.modules.values():
+            module.lanes.clear()
+        return names
+
+    def hidden():
+        return {name for name, module in wrapper.modules.items() if module.hidden}
+
+    wrapper.update_visibility()
+    assert hidden() == {"static_string f", "static_string h"}
+
+    # only the shown module updates its container, which passes it on
+    wrapper.notify_update("static_string f")
+    assert updated() == set()
+    wrapper.notify_update("static_string e")
+    assert updated() == {"group c"}
+    wrapper.notify_update("group c")
+    assert updated() == {"group b"}
+    wrapper.notify_update(["group b", "static_string g"])
+    assert updated() == {"frame a"}
+
+    # the group switches module, its content is changed in place
+    content["group c"].clear()
+    content["group c"].add("static_string f")
+    wrapper.notify_update("group c")
+    assert updated() == {"group b"}
+    assert hidden() == {"static_string e", "static_string h"}
+    wrapper.notify_update("static_string e")
+    assert updated() == set()
+    wrapper.notify_update("static_string f")
+    assert updated() == {"group c"}
+
+    # closing the outer frame hides everything in it
+    content["frame a"].clear()
+    wrapper.notify_update("frame a")
+    assert updated() == set()
+    assert hidden() == {name for name in wrapper.modules if name != "frame a"}
+    wrapper.notify_update("group b")
+    assert updated() == set()
+
+
+def test_no_wakeups_while_i3bar_stopped():
+    class I3status:
+        i3modules = {}
+
+        def suspend_i3status(self):
+            pass
+
+    class Task:
+        def run(self):
+            pass
+
+    wrapper = make_wrapper()
+    wrapper.config["py3_config"]["general"] = {}
+    wrapper.config["click_events"] = True
+    wrapper.i3status_thread = I3status()
+    wrapper.output_format = OutputFormat.instance_for("none")
+    wrapper.output_format.format_separator(None, None)
+    # something is due soon and often
+    wrapper.timeout_queue_add(Task(), time.monotonic() + 0.05)
+    wrapper.inhibit_signal_ts = 0
+    wrapper.i3bar_stop(SIGTSTP, None)
+
+    handlers = {signum: getsignal(signum) for signum in [SIGTERM, SIGUSR1]}
+    stopper = threading.Timer(0.5, os.kill, (os.getpid(), SIGTERM))
+    stopper.start()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            wrapper.run()
+    finally:
+        stopper.cancel()
+        for signum, handler in handlers.items():
+            signal(signum, handler)
+    assert len(wrapper.wakeups) == 0
+
+
+def test_timeout_missed_methods():
+    class Method:
+        module_full_name = "module"
+
+    wrapper = make_wrapper()
+    submitted = []
+    wrapper.workers.submit = lambda item, name, lane: submitted.append(item)
+    first, second = Method(), Method()
+
+    # both methods are due while the module is running
+    wrapper.timeout_running.add("module")
+    wrapper.timeout_update_due[LANE_BACKGROUND].extend([first, second])
+    wrapper.timeout_queue_process()
+    assert submitted == []
+    assert wrapper.timeout_missed["module"] == {first: LANE_BACKGROUND, second: LANE_BACKGROUND}
+
+    # neither is lost once the module has finished, they run in turn
+    wrapper.timeout_finished.append("module")
+    wrapper.timeout_queue_process()
+    assert submitted == [first]
+    wrapper.timeout_finished.append("module")
+    wrapper.timeout_queue_process()
+    assert submitted == [first, second]
+
+
+def make_snapshot_wrapper(tmp_path):
+    class Counter:
+        count = 0
+
+        def counter(self):
+            self.count += 1
+            return {"full_text": f"count {self.count}"}
+
+    mock = MockPy3statusWrapper(
+        {"general": {}, "py3status": {}, ".module_groups": {}, "counter": {}, "other": {}}
+    )
+    wrapper = make_wrapper({"storage": str(tmp_path / "storage.data")})
+    wrapper.config["i3status_config_path"] = tmp_path / "config"
+    wrapper.storage = Storage()
+    wrapper.storage.data = {}
+    for name in ["counter", "other"]:
+        module = Module(name, {}, mock, Counter())
+        module.testing = False
+        module.prepare_module()
+        wrapper.modules[name] = module
+    return wrapper
+
+
+def test_snapshot(tmp_path):
+    wrapper = make_snapshot_wrapper(tmp_path)
+    wrapper.load_snapshot()
+    assert not wrapper.update_queue
+    wrapper.modules["counter"].run()
+    wrapper.save_snapshot()
+    # only modules with output are saved
+    saved = wrapper.storage.storage_get("_snapshot", str(tmp_path / "config"))
+    assert list(saved) == ["counter"]
+    assert saved["counter"]["output"][0]["full_text"] == "count 1"
+
+    # nothing has changed so nothing is saved
+    saved_time = saved["counter"]["time"]
+    wrapper.save_snapshot(only_changed=True)
+    saved = wrapper.storage.storage_get("_snapshot", str(tmp_path / "config"))
+    assert saved["counter"]["time"] == saved_time
+
+    # the next time py3status starts the output is shown straight away
+    wrapper = make_snapshot_wrapper(tmp_path)
+    wrapper.snapshot_stale = True
+    wrapper.load_snapshot()
+    assert list(wrapper.update_queue) == ["counter"]
+    output = wrapper.modules["counter"].get_latest()[0]
+    assert output["full_text"] == "count 1"
+    assert output["color"] == STALE_COLOR
+    assert wrapper.modules["other"].get_latest() == []
+
+    # until the module updates
+    wrapper.modules["counter"].run()
+    assert "color" not in wrapper.modules["counter"].get_latest()[0]
+
+    # modules that have not updated keep their old output
+    wrapper.modules["other"].run()
+    wrapper.snapshot["counter"]["time"] -= SNAPSHOT_MAX_AGE + 1
+    wrapper.modules["counter"].mark_stale()
+    wrapper.save_snapshot()
+    wrapper = make_snapshot_wrapper(tmp_path)
+    wrapper.load_snapshot()
+    # but not for ever
+    assert list(wrapper.update_queue) == ["other"]
+
+
+def test_load_modules_order():
+    wrapper = make_wrapper()
+    reported = []
+
+    def create_module(module, discoverable_modules):
+        # the first modules take the longest to load
+        time.sleep(0.01 * (5 - int(module[-1])))
+        if module == "broken 3":
+            raise ImportError(module)
+        return Namespace(methods={module: {}}, lazy=False)
+
+    def report_exception(msg, **kwargs):
+        reported.append(msg)
+
+    wrapper.create_module = create_module
+    wrapper.report_exception = report_exception
+    modules = ["a 0", "b 1", "a 0", "c 2", "broken 3", "d 4"]
+    wrapper.load_modules(modules, {})
+    assert list(wrapper.modules) == ["a 0", "b 1", "c 2", "d 4"]
+    assert len(reported) == 1 and "broken 3" in reported[0]
+
+
+def test_closed_frame_urgent_child():
+    mock = MockPy3statusWrapper(
+        {
+            "general": {},
+            "py3status": {},
+            ".module_groups": {"g": ["frame a"]},
+            "frame a": {"items": ["g"], "format": "{button}{output}", "open": False},
+        }
+    )
+    queued = []
+    mock.timeout_queue_add = lambda item, *arg, **kw: queued.append(item)
+    frame = Module("frame a", {}, mock, Frame())
+    mock.output_modules["frame a"] = {"module": frame}
+    frame.prepare_module()
+    frame.run()
+    assert "urgent" not in frame.get_latest()[0]
+
+    wrapper = make_wrapper(module_groups={"g": ["frame a"]})
+    wrapper.output_modules["frame a"] = mock.output_modules["frame a"]
+    wrapper.notify_update("g", urgent=True)
+    # the closed frame is updated to show that it has an urgent child
+    assert frame in queued
+    frame.run()
+    assert frame.get_latest()[0]["urgent"]
@@ -9,11 +9,14 @@ from pprint import pformat
 import pytest
 
 from py3status.composite import Composite
-from py3status.formatter import Formatter
+from py3status.formatter import FormatCache, Formatter
 from py3status.py3 import NoneColor
+from py3status.stats import ModuleStats
 
 is_pypy = platform.python_implementation() == "PyPy"
 f = Formatter()
+# renders the Block tree rather than the compiled format
+f_tree = Formatter(compiled=False)
 
 param_dict = {
     "name": "Björk",
@@ -78,6 +81,12 @@ def attr_getter_fn(attr):
     return f"*{attr}*"
 
 
+def get_content(result):
+    if isinstance(result, Composite):
+        return result.get_content()
+    return result
+
+
 def run_formatter(test_dict):
     __tracebackhide__ = True
 
@@ -102,6 +111,20 @@ def run_formatter(test_dict):
         print("Format\n{}\n".format(test_dict["format"]))
         raise e
 
+    # the compiled format must give the same output as the Block tree
+    tree_result = f_tree.format(
+        test_dict["format"],
+        module,
+        param_dict,
+        force_composite=test_dict.get("composite"),
+        attr_getter=attr_getter,
+    )
+    if type(result) is not type(tree_result) or get_content(result) != get_content(tree_result):
+        print("Format\n{}\n".format(test_dict["format"]))
+        print("Compiled\n{}".format(pformat(get_content(result))))
+        print("Tree\n{}".format(pformat(get_content(tree_result))))
+        pytest.fail("Compiled format differs from the Block tree")
+
     # simplify the composite and convert to text if possible
     if isinstance(result, Composite):
         result.simplify()
@@ -1405,6 +1428,93 @@ def test_get_color_names_4():
     )
 
 
+def test_format_cache():
+    cache = FormatCache(size=2)
+    stats = ModuleStats()
+    parsed = cache.get("{a}", stats)
+    assert cache.get("{a}", stats) is parsed
+    cache.get("{b}", stats)
+    # the least recently used format is dropped
+    cache.get("{a}", stats)
+    cache.get("{c}", stats)
+    assert list(cache.entries) == ["{a}", "{c}"]
+    assert stats.as_dict() == {
+        "format_cache_hits": 2,
+        "format_cache_misses": 3,
+        "format_cache_evictions": 1,
+    }
+    cache.set_size(1)
+    assert list(cache.entries) == ["{c}"]
+    assert cache.as_dict() == {"entries": 1, "evictions": 2, "hits": 2, "misses": 3, "size": 1}
+
+    # formats still work once dropped from the cache
+    formatter = Formatter(stats=stats)
+    formatter.cache = cache
+    assert formatter.get_placeholders("{a} {b}") == {"a", "b"}
+    assert formatter.format("{a} {b}", param_dict={"a": 1, "b": 2}).text() == "1 2"
+    assert formatter.format("{a}", param_dict={"a": 1}).text() == "1"
+    assert formatter.format("{a} {b}", param_dict={"a": 1, "b": 2}).text() == "1 2"
+    assert list(cache.entries) == ["{a} {b}"]
+
+
+def test_format_memo():
+    stats = ModuleStats()
+    formatter = Formatter(stats=stats)
+    module = Module()
+    format_string = r"{name} [\?color=good {number}] {module_param}"
+
+    def run(params, **kwargs):
+        return formatter.format(format_string, module, params, memo_key="test", **kwargs)
+
+    first = run({"name": "Björk", "number": 42})
+    assert first.text() == "Björk 42 something"
+    # unused values do not matter
+    second = run({"name": "Björk", "number": 42, "unused": [1]})
+    assert second.get_content() == first.get_content()
+    assert stats.counters["format_memo_hits"] == 1
+    assert stats.counters["format_memo_misses"] == 1
+
+    # changing the output does not change what is memoized
+    second[0]["full_text"] = "changed"
+    assert run({"name": "Björk", "number": 42}).text() == "Björk 42 something"
+    assert stats.counters["format_memo_hits"] == 2
+
+    # a changed value, type, module attribute or color is rendered again
+    assert run({"name": "Björk", "number": 43}).text() == "Björk 43 something"
+    assert run({"name": "Björk", "number": True}).text() == "Björk True something"
+    module.module_param = "else"
+    assert run({"name": "Björk", "number": True}).text() == "Björk True else"
+    module.py3 = type("py3", (), {"COLOR_GOOD": "#00FF01"})
+    assert run({"name": "Björk", "number": True})[1]["color"] == "#00FF01"
+    assert stats.counters["format_memo_hits"] == 2
+    assert stats.counters["format_memo_misses"] == 5
+
+    # values that cannot be compared cheaply or attr_getter are not memoized
+    class Name(str):
+        pass
+
+    run({"name": Name("Björk"), "number": 42})
+    run({"name": "Björk", "number": 42}, attr_getter=attr_getter_fn)
+    assert stats.counters["format_memo_hits"] == 2
+    assert stats.counters["format_memo_misses"] == 5
+
+
+def test_format_memo_missing():
+    formatter = Formatter()
+    module = Module()
+
+    def run():
+        output = formatter.format("{missing}", module, force_composite=True, memo_key="test")
+        return output.text()
+
+    # a missing placeholder is shown, one set to None is not
+    assert run() == "{missing}"
+    module.missing = None
+    assert run() == ""
+    del module.missing
+    assert run() == "{missing}"
+
+
 if __name__ == "__main__":
     # run tests
     import sys
@@ -0,0 +1,84 @@
+import select
+import time
+from argparse import Namespace
+
+from py3status.core import Py3statusWrapper
+from py3status.i3status import I3status
+
+FAKE_I3STATUS = """#!/bin/sh
+echo '{"version":1}'
+echo '['
+echo '[{"name":"load","full_text":"0.1"}]'
+sleep 0.2
+echo ',[{"name":"load","full_text":"0.2"}]'
+sleep 0.5
+echo 'i3status: bad things happened.' >&2
+exit 1
+"""
+
+
+class CountingPoll:
+    """
+    A select.poll() that counts how often it returns.
+    """
+
+    wakeups = 0
+    timeouts = 0
+
+    def __init__(self):
+        self.poller = POLL()
+
+    def register(self, fd, eventmask):
+        self.poller.register(fd, eventmask)
+
+    def unregister(self, fd):
+        self.poller.unregister(fd)
+
+    def poll(self, *args):
+        result = self.poller.poll(*args)
+        CountingPoll.wakeups += 1
+        if not result:
+            CountingPoll.timeouts += 1
+        return result
+
+
+POLL = select.poll
+
+
+def test_read_i3status_wakeups(tmp_path, monkeypatch):
+    i3status_path = tmp_path / "i3status"
+    i3status_path.write_text(FAKE_I3STATUS)
+    i3status_path.chmod(0o755)
+
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.config["i3status_path"] = i3status_path
+    wrapper.config["standalone"] = False
+    wrapper.config["py3_config"] = {
+        "general": {"interval": 5},
+        "i3s_modules": ["load"],
+        "load": {},
+        ".module_groups": {},
+        "order": ["load"],
+    }
+    monkeypatch.setattr(select, "poll", CountingPoll)
+    i3status = I3status(wrapper)
+
+    start = time.monotonic()
+    i3status.start()
+    assert i3status.startup_done.wait(5)
+    assert i3status.ready
+    while not i3status.error and time.monotonic() - start < 5:
+        time.sleep(0.05)
+    wakeups = CountingPoll.wakeups
+    # do not restart i3status
+    wrapper.running = False
+    wrapper.lock.set()
+    i3status.join(5)
+    assert not i3status.is_alive()
+    assert time.monotonic() - start >= 0.7
+
+    assert i3status.i3modules["load"].item["full_text"] == "0.2"
+    assert str(i3status.error) == "bad things happened"
+    # only woken for output and the exit, never on a timer
+    assert CountingPoll.timeouts == 0
+    assert 3 <= wakeups <= 8
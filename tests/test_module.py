@@ -0,0 +1,424 @@
+import asyncio
+import os
+import threading
+import time
+from argparse import Namespace
+
+import pytest
+
+from py3status.core import Py3statusWrapper
+from py3status.exceptions import CommandError
+from py3status.module import Module
+from py3status.module_test import MockPy3statusWrapper
+from py3status.scheduler import AsyncLoop
+from py3status.storage import Storage
+
+
+def make_module(module_class, config=None):
+    mock = MockPy3statusWrapper(
+        {
+            "general": {},
+            "py3status": {},
+            ".module_groups": {},
+            "test_module": config or {},
+        }
+    )
+    m = Module("test_module", {}, mock, module_class())
+    m.prepare_module()
+    # errors are shown in the output rather than raised
+    m.testing = False
+    return m
+
+
+def run_due(m):
+    for my_method in m.methods.values():
+        my_method["cached_until"] = time.monotonic()
+    m.run()
+    return m.cache_time - time.monotonic()
+
+
+def test_import_error(tmp_path):
+    (tmp_path / "broken.py").write_text("raise ImportError('no backend')\n")
+    mock = MockPy3statusWrapper(
+        {"general": {}, "py3status": {}, ".module_groups": {}, "broken": {}}
+    )
+    m = Module("broken", {"broken": (tmp_path, "broken.py")}, mock)
+    assert m.disabled
+    assert m.get_latest()[0]["full_text"] == "broken"
+
+
+class FailingModule:
+    cache_timeout = 10
+    fail = True
+
+    def failing(self):
+        if self.fail:
+            raise Exception("backend down")
+        return {"full_text": "ok"}
+
+
+def test_backoff():
+    m = make_module(FailingModule, {"backoff_max": 50})
+    assert 9 < run_due(m) <= 10
+    assert 15 < run_due(m) <= 20
+    assert "retry in" in m.get_latest()[0]["full_text"]
+    assert 30 < run_due(m) <= 40
+    # capped
+    assert 39 < run_due(m) <= 50
+    assert 39 < run_due(m) <= 50
+
+    # reset on success
+    m.module_class.fail = False
+    run_due(m)
+    assert m.get_latest()[0]["full_text"] == "ok"
+    m.module_class.fail = True
+    assert 9 < run_due(m) <= 10
+    assert "retry in" not in m.get_latest()[0]["full_text"]
+
+
+class HalfFailingModule:
+    cache_timeout = 10
+
+    def bad(self):
+        raise Exception("backend down")
+
+    def good(self):
+        return {"full_text": "ok"}
+
+
+def test_backoff_per_method():
+    m = make_module(HalfFailingModule, {"backoff_max": 50})
+    bad, good = m.methods["bad"], m.methods["good"]
+    for expected in [10, 20, 40]:
+        run_due(m)
+        # the working method does not stop the failing one backing off
+        assert expected * 0.75 < bad["cached_until"] - time.monotonic() <= expected
+        assert 9 < good["cached_until"] - time.monotonic() <= 11
+    assert m.method_runners["bad"].backoff_failures == 3
+    assert m.method_runners["good"].backoff_failures == 0
+
+
+def test_backoff_disabled():
+    m = make_module(FailingModule, {"backoff_max": 0})
+    for _ in range(3):
+        assert 9 < run_due(m) <= 10
+
+
+class AsyncModule:
+    clicks = 0
+
+    async def hello(self):
+        output = await self.py3.command_output_async(["echo", "hello"])
+        return {"full_text": output.strip()}
+
+    def world(self):
+        self.world_thread = threading.current_thread()
+        return {"full_text": "world"}
+
+    async def on_click(self, event):
+        await asyncio.sleep(0)
+        self.clicks += 1
+
+
+def test_async_module():
+    m = make_module(AsyncModule)
+    m._py3_wrapper.async_loop = AsyncLoop(m._py3_wrapper)
+    assert m.has_async
+    # only the async method is run on the loop
+    assert m.method_runners["hello"].is_async
+    assert not m.method_runners["world"].is_async
+    try:
+        m.run()
+    finally:
+        m._py3_wrapper.async_loop.stop()
+    assert [x["full_text"] for x in m.get_latest()] == ["hello", "world"]
+    assert m.module_class.world_thread is threading.current_thread()
+    assert m.stats.counters["runs"] == 1
+
+
+def test_async_on_click():
+    m = make_module(AsyncModule)
+    m._py3_wrapper.async_loop = AsyncLoop(m._py3_wrapper)
+    m.click_event({"button": 1})
+    m._py3_wrapper.async_loop.stop()
+    assert m.module_class.clicks == 1
+
+
+def test_command_output_async_error():
+    m = make_module(AsyncModule)
+    py3 = m.module_class.py3
+    with pytest.raises(CommandError):
+        asyncio.run(py3.command_output_async("false"))
+
+
+class ProcessModule:
+    crash = False
+
+    def pid(self):
+        if self.crash:
+            os._exit(1)
+        self.py3.storage_set("pid", os.getpid())
+        return {"full_text": str(os.getpid())}
+
+    def on_click(self, event):
+        self.crash = True
+        self.py3.prevent_refresh()
+
+
+def test_process_execution(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    m = make_module(ProcessModule, {"execution": "process"})
+    py3 = m.module_class.py3
+    py3._storage = Storage()
+    py3._storage.data = {}
+    try:
+        run_due(m)
+        pid = int(m.get_latest()[0]["full_text"])
+        assert pid != os.getpid()
+        # storage is done by py3status
+        assert py3.storage_get("pid") == pid
+
+        m.click_event({"button": 1})
+        assert m.prevent_refresh
+        # the click was handled by the worker process
+        assert not m.module_class.crash
+
+        run_due(m)
+        assert "worker process died" in m.error_messages[-1]
+        assert m.stats.counters["process_restarts"] == 1
+
+        # restarted
+        run_due(m)
+        new_pid = int(m.get_latest()[0]["full_text"])
+        assert new_pid not in (pid, os.getpid())
+    finally:
+        m.kill()
+    assert m.process.process is None
+
+
+class HungProcessModule:
+    def hung(self):
+        if self.py3.storage_get("hang"):
+            time.sleep(60)
+        return {"full_text": str(os.getpid())}
+
+
+def test_process_hung(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    m = make_module(HungProcessModule, {"execution": "process", "run_deadline": 0.5})
+    py3 = m.module_class.py3
+    py3._storage = Storage()
+    py3._storage.data = {}
+    try:
+        run_due(m)
+        pid = int(m.get_latest()[0]["full_text"])
+        py3.storage_set("hang", True)
+        start = time.monotonic()
+        run_due(m)
+        # the worker did not reply in time so it was killed
+        assert time.monotonic() - start < 5
+        assert "worker process died" in m.error_messages[-1]
+        assert m.stats.counters["process_restarts"] == 1
+
+        py3.storage_set("hang", False)
+        run_due(m)
+        assert int(m.get_latest()[0]["full_text"]) != pid
+    finally:
+        m.kill()
+
+
+class HiddenModule:
+    # time_in() aligns runs to the second so they are due 10 to 11s away
+    cache_timeout = 10
+
+    def hidden(self):
+        return {"full_text": "hidden"}
+
+
+def test_hidden_interval():
+    m = make_module(HiddenModule, {"hidden_interval": 300})
+    queued = []
+    m._py3_wrapper.timeout_queue_add = lambda item, cache_time=0, lane=None: queued.append(
+        cache_time
+    )
+    assert 9 < run_due(m) <= 11
+    m.set_hidden(True)
+    run_due(m)
+    assert 299 < queued[-1] - time.monotonic() <= 300
+    # shown again it goes back to its normal schedule
+    m.set_hidden(False)
+    assert 9 < queued[-1] - time.monotonic() <= 11
+
+
+def test_hidden_pause():
+    m = make_module(HiddenModule, {"hidden_pause": True})
+    queued = []
+    m._py3_wrapper.timeout_queue_add = lambda item, cache_time=0, lane=None: queued.append(
+        cache_time
+    )
+    m.set_hidden(True)
+    run_due(m)
+    assert queued == []
+    m.set_hidden(False)
+    assert 9 < queued[-1] - time.monotonic() <= 11
+
+
+class TwoMethodModule:
+    composite = "a"
+
+    def static(self):
+        return {"full_text": "static"}
+
+    def changing(self):
+        composite = [{"full_text": self.composite, "color": "#FF0000"}, {"full_text": "b"}]
+        return {"full_text": composite}
+
+
+def test_set_updated_versions():
+    m = make_module(TwoMethodModule)
+    updates = []
+    m._py3_wrapper.notify_update = lambda name, urgent=False: updates.append(name)
+
+    run_due(m)
+    updates.clear()
+    versions = [method["version"] for method in m.methods.values()]
+    output = m.get_latest()
+    assert [x["full_text"] for x in output] == ["a", "b", "static"]
+
+    # the same output again, nothing has changed
+    run_due(m)
+    assert updates == []
+    assert [method["version"] for method in m.methods.values()] == versions
+    assert m.get_latest() is output
+    assert m.stats.as_dict()["unchanged_output"] == 2
+
+    # only the changed method gets a new version
+    m.module_class.composite = "c"
+    run_due(m)
+    assert updates == ["test_module"]
+    assert [method["version"] for method in m.methods.values()] == [versions[0] + 1, versions[1]]
+    assert [x["full_text"] for x in m.get_latest()] == ["c", "b", "static"]
+
+    # stale output is put back even though the methods have not changed
+    m.mark_stale()
+    assert len(updates) == 2
+    m.clear_stale()
+    assert len(updates) == 3
+    assert "color" not in m.get_latest()[2]
+
+
+class TwoCadenceModule:
+    def __init__(self):
+        self.calls = []
+
+    def fast(self):
+        self.calls.append("fast")
+        return {"full_text": "fast", "cached_until": self.py3.time_in(1)}
+
+    def slow(self):
+        self.calls.append("slow")
+        return {"full_text": "slow", "cached_until": self.py3.time_in(100)}
+
+
+def test_method_scheduling():
+    m = make_module(TwoCadenceModule)
+    queued = {}
+    m._py3_wrapper.timeout_queue_add = lambda item, cache_time=0, lane=None: queued.update(
+        {item: cache_time - time.monotonic()}
+    )
+    fast, slow = m.method_runners["fast"], m.method_runners["slow"]
+    calls = m.module_class.calls
+
+    # each method is queued for when it is due
+    m.run()
+    assert calls == ["fast", "slow"]
+    assert queued.keys() == {fast, slow}
+    assert 0 < queued[fast] <= 2
+    assert 99 < queued[slow] <= 101
+    assert 0 < m.cache_time - time.monotonic() <= 2
+
+    # only the method that is due is run, the output keeps its order
+    calls.clear()
+    m.methods["fast"]["cached_until"] = time.monotonic()
+    fast.run()
+    assert calls == ["fast"]
+    assert [x["full_text"] for x in m.get_latest()] == ["fast", "slow"]
+
+    # a method that is not due yet is just queued again
+    queued.clear()
+    slow.run()
+    assert calls == ["fast"]
+    assert 98 < queued[slow] <= 101
+
+
+
+def test_method_timer_slack():
+    m = make_module(TwoCadenceModule, {"timer_slack": 5})
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.timeout_process_add_queue("other", 12)
+    fast = m.method_runners["fast"]
+    # the method runs with the module's other wakeup
+    wrapper.timeout_process_add_queue(fast, 10)
+    assert wrapper.timeout_queue.get(fast) == 12
+
+
+LAZY_MODULE = """
+class Py3status:
+    def post_config_hook(self):
+        self.text = "loaded"
+
+    def lazy(self):
+        return {"full_text": self.text}
+"""
+
+
+def make_lazy_module(tmp_path, module_groups=None):
+    (tmp_path / "lazy.py").write_text(LAZY_MODULE)
+    mock = MockPy3statusWrapper(
+        {
+            "general": {},
+            "py3status": {"lazy_load": True},
+            ".module_groups": module_groups or {},
+            "lazy": {},
+        }
+    )
+    m = Module("lazy", {"lazy": (tmp_path, "lazy.py")}, mock)
+    m.testing = False
+    queued = []
+    mock.timeout_queue_add = lambda item, cache_time=0, lane=None: queued.append(item)
+    return m, queued
+
+
+def test_lazy_load(tmp_path):
+    m, queued = make_lazy_module(tmp_path)
+    # nothing is imported until the module is first run
+    assert m.lazy and not m.loaded
+    assert m.module_class is None
+    assert m.get_latest()[0]["full_text"] == "lazy"
+
+    m.start_module()
+    assert queued == [m]
+    m.run()
+    assert m.loaded and m.enabled
+    assert list(m.methods) == ["lazy"]
+    # the module is started in the normal way
+    assert queued == [m, m]
+    m.run()
+    assert m.get_latest()[0]["full_text"] == "loaded"
+
+    # it is never started again
+    queued.clear()
+    m.start_module()
+    assert queued == []
+
+
+def test_lazy_load_hidden(tmp_path):
+    m, queued = make_lazy_module(tmp_path, {"lazy": ["group"]})
+    # modules in a container wait until they are shown
+    assert m.hidden
+    m.start_module()
+    assert queued == []
+    m.set_hidden(False)
+    assert queued == [m]
+    m.run()
+    assert m.loaded
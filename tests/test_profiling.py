@@ -0,0 +1,57 @@
+import time
+from argparse import Namespace
+
+from py3status import codec
+from py3status.core import Py3statusWrapper
+from py3status.profiling import StartupProfile, format_startup_profile
+
+
+def test_startup_profile():
+    profile = StartupProfile()
+    with profile.stage("config parsing"):
+        for _ in range(2):
+            with profile.stage("config shell() calls"):
+                time.sleep(0.01)
+    profile.pending = {"clock", "sysdata"}
+    profile.add_module("clock", "import", 0.5)
+    profile.add_module("clock", "post_config_hook", 0.25)
+    profile.module_started("clock")
+    profile.add_module("sysdata", "import", 1)
+
+    report = profile.report()
+    # stages are in the order they started
+    assert list(report["stages"]) == ["config parsing", "config shell() calls"]
+    shell = report["stages"]["config shell() calls"]
+    assert shell["count"] == 2
+    assert shell["time"] >= 0.02
+    assert report["stages"]["config parsing"]["time"] >= shell["time"]
+    assert report["pending"] == ["sysdata"]
+    assert "modules started" not in report["milestones"]
+
+    text = format_startup_profile(report)
+    assert "config shell() calls x2" in text
+    # slowest module first
+    assert text.index("sysdata") < text.index("clock")
+    assert "still starting" in text
+
+    profile.module_started("sysdata")
+    assert "modules started" in profile.report()["milestones"]
+
+
+def test_startup_profile_report(tmp_path):
+    json_path = tmp_path / "profile.json"
+    wrapper = Py3statusWrapper(Namespace(startup_profile=False, startup_profile_json=json_path))
+    profile = wrapper.startup_profile
+    profile.pending = {"clock"}
+
+    # wait for the modules to start
+    wrapper.startup_profile_report()
+    assert not profile.reported
+    assert not json_path.exists()
+
+    profile.module_started("clock")
+    wrapper.startup_profile_report()
+    assert profile.reported
+    report = codec.loads(json_path.read_text())
+    assert report["pending"] == []
+    assert set(report["milestones"]) == {"first write to the bar", "modules started"}
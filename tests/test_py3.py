@@ -218,3 +218,7 @@ def test_flatten_dict_parent_key():
     print("returned data")
     print(pformat(returned))
     assert returned == expected
+
+
+def test_safe_format_no_module():
+    assert py3.safe_format("{name} [{missing}]", {"name": "py3"}).text() == "py3 "
@@ -0,0 +1,201 @@
+import asyncio
+import time
+from argparse import Namespace
+from threading import Event, current_thread
+
+from py3status.core import Py3statusWrapper
+from py3status.scheduler import (
+    COMPACT_MIN_REMOVED,
+    LANE_BACKGROUND,
+    LANE_INTERACTIVE,
+    LANE_URGENT,
+    AsyncLoop,
+    TimeoutQueue,
+    WorkerPool,
+)
+
+
+def test_timeout_queue_order():
+    queue = TimeoutQueue()
+    queue.add("c", 3)
+    queue.add("a", 1)
+    queue.add("b", 2)
+    queue.add("a2", 1)
+    assert queue.next_due() == 1
+    assert queue.pop_due(2) == ["a", "a2", "b"]
+    assert queue.next_due() == 3
+    assert len(queue) == 1
+    assert queue.pop_due(10) == ["c"]
+    assert queue.next_due() is None
+
+
+def test_timeout_queue_reschedule():
+    queue = TimeoutQueue()
+    queue.add("a", 1)
+    queue.add("b", 2)
+    # rescheduling replaces the old time
+    queue.add("a", 5)
+    assert queue.get("a") == 5
+    assert queue.next_due() == 2
+    assert queue.pop_due(4) == ["b"]
+    assert queue.pop_due(5) == ["a"]
+    assert "a" not in queue
+
+
+def test_timeout_queue_remove_compacts():
+    queue = TimeoutQueue()
+    for i in range(COMPACT_MIN_REMOVED * 4):
+        queue.add(i, i)
+    for i in range(COMPACT_MIN_REMOVED * 3):
+        queue.remove(i)
+    # dead entries are not allowed to pile up
+    assert len(queue.heap) < COMPACT_MIN_REMOVED * 4
+    assert queue.next_due() == COMPACT_MIN_REMOVED * 3
+    assert len(queue) == COMPACT_MIN_REMOVED
+
+
+def test_wrapper_timeout_queue():
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.timeout_process_add_queue("a", 10)
+    wrapper.timeout_process_add_queue("b", 20)
+    assert wrapper.timeout_due == 10
+    # clear_timeout_due is queued to the core thread
+    wrapper.clear_timeout_due("a")
+    wrapper.timeout_process_add_queue(*wrapper.timeout_add_queue.popleft())
+    assert wrapper.timeout_due == 20
+    # cache_time 0 means update now
+    wrapper.timeout_process_add_queue("b", 0)
+    assert wrapper.timeout_due is None
+    assert list(wrapper.timeout_update_due[LANE_BACKGROUND]) == ["b"]
+
+
+def test_wrapper_lanes():
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.timeout_process_add_queue("a", 0)
+    wrapper.timeout_process_add_queue("b", 0, LANE_URGENT)
+    # a click on a moves it to the interactive lane
+    wrapper.timeout_process_add_queue("a", 0, LANE_INTERACTIVE)
+    wrapper.timeout_process_add_queue("b", 0)
+    assert [list(due) for due in wrapper.timeout_update_due] == [["a"], ["b"], []]
+
+
+def test_worker_pool_lanes():
+    order = []
+
+    class Task:
+        def __init__(self, name):
+            self.name = name
+
+        def run(self):
+            order.append(self.name)
+            if self.name == "first":
+                started.set()
+                release.wait(5)
+
+    started = Event()
+    release = Event()
+    wrapper = Py3statusWrapper(Namespace())
+    pool = WorkerPool(wrapper, max_workers=1)
+    pool.submit(Task("first"), "first")
+    started.wait(5)
+    # the only worker is busy so these queue
+    pool.submit(Task("background"), "background", LANE_BACKGROUND)
+    pool.submit(Task("urgent"), "urgent", LANE_URGENT)
+    # but interactive work gets a reserve thread
+    pool.submit(Task("click"), "click", LANE_INTERACTIVE)
+    deadline = time.monotonic() + 5
+    while "click" not in order and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert order == ["first", "click"]
+    release.set()
+    while len(wrapper.timeout_finished) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pool.stop()
+    assert order == ["first", "click", "urgent", "background"]
+
+
+def test_worker_pool_reuses_threads():
+    class Task:
+        def __init__(self):
+            self.threads = set()
+
+        def run(self):
+            self.threads.add(current_thread().name)
+            time.sleep(0.01)
+
+    wrapper = Py3statusWrapper(Namespace())
+    pool = WorkerPool(wrapper, max_workers=2)
+    task = Task()
+    for i in range(10):
+        pool.submit(task, f"task {i}")
+    deadline = time.monotonic() + 5
+    while len(wrapper.timeout_finished) < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pool.stop()
+    assert sorted(wrapper.timeout_finished) == sorted(f"task {i}" for i in range(10))
+    assert len(pool.threads) == 2
+    assert len(task.threads) <= 2
+
+
+def test_timeout_queue_find_wakeup():
+    queue = TimeoutQueue()
+    queue.add("a", 10.5)
+    queue.add("b", 12)
+    queue.add("c", 12)
+    assert queue.find_wakeup(10, 11) == 10.5
+    assert queue.find_wakeup(10.6, 12.5) == 12
+    assert queue.find_wakeup(12.1, 20) is None
+    queue.remove("b")
+    assert queue.find_wakeup(11, 12) == 12
+    queue.pop_due(12)
+    assert queue.find_wakeup(0, 20) is None
+    assert queue.wakeups == {}
+
+
+def test_wrapper_timer_slack():
+    class SlackModule:
+        timer_slack = 1
+
+    wrapper = Py3statusWrapper(Namespace())
+    wrapper.timeout_process_add_queue("a", 10)
+    module = SlackModule()
+    # folded into the existing wakeup
+    wrapper.timeout_process_add_queue(module, 9.2)
+    assert wrapper.timeout_queue.get(module) == 10
+    # nothing to fold into
+    wrapper.timeout_process_add_queue(module, 11.5)
+    assert wrapper.timeout_queue.get(module) == 11.5
+    # items without slack are never moved
+    wrapper.timeout_process_add_queue("b", 9.2)
+    assert wrapper.timeout_queue.get("b") == 9.2
+
+
+def test_async_loop_runs_concurrently():
+    class Task:
+        def __init__(self):
+            self.threads = set()
+
+        async def run_async(self):
+            self.threads.add(current_thread().name)
+            await asyncio.sleep(0.2)
+
+    wrapper = Py3statusWrapper(Namespace())
+    loop = AsyncLoop(wrapper)
+    task = Task()
+    start = time.monotonic()
+    for i in range(50):
+        loop.submit(task, f"task {i}")
+    deadline = time.monotonic() + 5
+    while len(wrapper.timeout_finished) < 50 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # all the tasks waited at the same time on the one thread
+    assert time.monotonic() - start < 2
+    assert sorted(wrapper.timeout_finished) == sorted(f"task {i}" for i in range(50))
+    assert task.threads == {"py3status-asyncio"}
+    assert not loop.active
+
+    async def add(a, b):
+        return a + b
+
+    assert loop.run(add(1, 2)) == 3
+    loop.stop()
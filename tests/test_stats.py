@@ -0,0 +1,22 @@
+from py3status.stats import Histogram, ModuleStats
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in [0.00005, 0.002, 0.003, 100]:
+        histogram.add(value)
+    result = histogram.as_dict()
+    assert result["count"] == 4
+    assert result["max"] == 100
+    assert result["buckets"] == {"<=0.0001": 1, "<=0.005": 2, ">60": 1}
+
+
+def test_module_stats():
+    stats = ModuleStats()
+    stats.count("runs")
+    stats.count("runs")
+    stats.record("wall_time", 0.5)
+    result = stats.as_dict()
+    assert result["runs"] == 2
+    assert result["wall_time"]["count"] == 1
+    assert result["wall_time"]["mean"] == 0.5
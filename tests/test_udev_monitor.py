@@ -0,0 +1,47 @@
+import logging
+import threading
+import time
+
+from py3status import udev_monitor
+from py3status.udev_monitor import UdevMonitor
+
+
+class FakePyudev:
+    observers = []
+
+    class Context:
+        pass
+
+    class Monitor:
+        @staticmethod
+        def from_netlink(context):
+            # give other subscribers time to race us
+            time.sleep(0.05)
+
+    class MonitorObserver:
+        def __init__(self, monitor, callback):
+            FakePyudev.observers.append(self)
+
+        def start(self):
+            pass
+
+
+class Consumer:
+    _logger = logging.getLogger(__name__)
+
+
+def test_subscribe_concurrently(monkeypatch):
+    monkeypatch.setattr(udev_monitor, "pyudev", FakePyudev)
+    FakePyudev.observers = []
+    monitor = UdevMonitor(None)
+    threads = [
+        threading.Thread(target=monitor.subscribe, args=(Consumer(), "refresh", "usb"))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # a single observer for all the modules
+    assert len(FakePyudev.observers) == 1
+    assert len(monitor.udev_consumers["usb"]) == 4